@@ -18,16 +18,24 @@ from __future__ import print_function
 import numpy as np
 import mmap
 import os
-import pickle
-import bisect
-import subprocess
 import hashlib
-from io import BytesIO
+import gzip
+import re
+import json
+import struct
+import multiprocessing
+import collections
+from io import BytesIO, StringIO
 
 from distutils.version import StrictVersion
 
 msun = 1.9892*10**33
 
+# Bump when the layout of the on-disk column cache changes
+_CACHE_VERSION = 3
+_CACHE_MAGIC = b'MESAPLOT'
+_CACHE_ALIGN = 64
+
 #Conviently the index of this list is the proton number
 _elementsPretty=['neut','H', 'He', 'Li', 'Be', 'B', 'C', 'N', 
                     'O', 'F', 'Ne', 'Na', 'Mg', 'Al', 'Si', 'P', 
@@ -56,6 +64,645 @@ def _hash(fname):
         for chunk in iter(lambda: f.read(4096), b""):
             hash_md5.update(chunk)
     return hash_md5.hexdigest()
+    
+    
+# How much of each end of the file the 'sample' cache check hashes
+_SAMPLE_SIZE = 65536
+    
+def _fingerprint(fname, cache_check='stat'):
+    """
+    Returns a fingerprint of fname used to decide whether a cache of it is still valid.
+    
+    cache_check:
+        'stat': File size, modification time and inode, does not read the file
+        'sample': File size and an MD5 of the first and last 64 kB of the file
+        'full': MD5 of the whole file
+    
+    The fingerprint starts with the policy used so fingerprints made with
+    different policies never compare equal. Returns None if fname does not exist.
+    """
+    if not os.path.exists(fname):
+        return None
+    
+    if cache_check == 'stat':
+        st = os.stat(fname)
+        return ':'.join([cache_check,str(st.st_size),repr(st.st_mtime),str(st.st_ino)])
+    elif cache_check == 'sample':
+        size = os.path.getsize(fname)
+        hash_md5 = hashlib.md5()
+        with open(fname, "rb") as f:
+            hash_md5.update(f.read(_SAMPLE_SIZE))
+            if size > _SAMPLE_SIZE:
+                f.seek(max(size-_SAMPLE_SIZE,_SAMPLE_SIZE))
+                hash_md5.update(f.read())
+        return ':'.join([cache_check,str(size),hash_md5.hexdigest()])
+    elif cache_check == 'full':
+        return ':'.join([cache_check,_hash(fname)])
+    else:
+        raise ValueError("cache_check must be one of 'stat', 'sample' or 'full', got "+str(cache_check))
+
+
+def _fieldEnds(line):
+    """
+    Returns the position one past the last character of each whitespace
+    separated field in line.
+    
+    MESA right aligns every column so the end of each name in the names line
+    marks the right hand edge of that column for every row of data.
+    """
+    return [m.end() for m in re.finditer(rb'\S+', line)]
+
+
+def _parseFixedWidth(body, ends, names, usecols=None):
+    """
+    Parses the body of a MESA history or profile file by slicing each column
+    straight out of the byte buffer and converting it with numpy.
+    
+    body: bytes (or a memoryview of them), containing only complete lines of data
+    ends: Right hand edge of each column (see _fieldEnds)
+    names: Names of every column in the file
+    usecols: Index of the columns to keep, if None keep all columns
+    
+    Returns a structured array, or None if the body is not fixed width (in
+    which case the caller should fall back to genfromtxt).
+    """
+    if usecols is None:
+        usecols = range(len(names))
+    
+    if len(body) == 0:
+        return np.zeros(0, dtype=[(names[i],'<f8') for i in usecols])
+    
+    # Only copy out enough of body to find the end of the first line
+    size = 65536
+    while True:
+        width = bytes(body[:size]).find(b'\n') + 1
+        if width or size >= len(body):
+            break
+        size = size*4
+    if width == 0 or len(body) % width or ends[-1] >= width:
+        return None
+
+    raw = np.frombuffer(body, dtype=np.uint8).reshape(-1, width)
+    if not np.all(raw[:,-1] == ord('\n')):
+        return None
+    
+    starts = [0] + list(ends[:-1])
+    columns = []
+    for i in usecols:
+        # Right aligned so the last character in each field can not be blank
+        if np.any(raw[:,ends[i]-1] == ord(' ')):
+            return None
+        col = np.ascontiguousarray(raw[:,starts[i]:ends[i]])
+        col = col.view('S'+str(ends[i]-starts[i])).ravel()
+        try:
+            col = col.astype(np.int64)
+        except ValueError:
+            try:
+                col = col.astype(np.float64)
+            except ValueError:
+                return None
+        columns.append(col)
+        
+    x = np.empty(raw.shape[0], dtype=[(names[i],c.dtype) for i,c in zip(usecols,columns)])
+    for i,c in zip(usecols,columns):
+        x[names[i]] = c
+    return x
+
+
+def _poolMap(func, args, workers):
+    """
+    Returns [func(i) for i in args], computed by a pool of up to workers processes 
+    if workers>1 and there is more than one job. func must be defined at module level
+    so the pool can pickle it.
+    """
+    if workers <= 1 or len(args) <= 1:
+        return [func(i) for i in args]
+    pool = multiprocessing.Pool(min(workers, len(args)))
+    try:
+        return pool.map(func, args, chunksize=max(1, len(args)//(4*workers)))
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _parseChunkWorker(args):
+    """Parses length bytes of a fixed width file from offset"""
+    filename, offset, length, ends, names, usecols = args
+    with open(filename,'rb') as f:
+        f.seek(offset)
+        body = f.read(length)
+    return _parseFixedWidth(body, ends, names, usecols)
+    
+    
+def _parseParallel(filename, layout, usecols=None, max_num_lines=-1, workers=2, min_rows=10000):
+    """
+    Parses the body of a fixed width file in chunks of whole lines with a pool of
+    workers processes, see _parseFixedWidth. Chunks are joined in file order, with each
+    column promoted to a type that can hold it from every chunk.
+    
+    Returns (x, end_offset) or (None, None) if the file is not fixed width.
+    """
+    start, width = layout['start'], layout['width']
+    # Ignore any partially written final line
+    nrows = (os.path.getsize(filename)-start)//width
+    if max_num_lines > 0:
+        nrows = min(nrows, max_num_lines)
+    nchunks = max(1, min(workers, nrows//min_rows))
+    bounds = np.linspace(0, nrows, nchunks+1).astype(np.int64)
+    args = [(filename, start+i*width, (j-i)*width, layout['ends'], layout['names'], usecols) 
+            for i,j in zip(bounds[:-1],bounds[1:])]
+    
+    chunks = _poolMap(_parseChunkWorker, args, nchunks)
+    if any(i is None for i in chunks):
+        return None, None
+    
+    x = np.empty(nrows, dtype=_promoteDtype(chunks, chunks[0].dtype.names))
+    for i,c in zip(bounds[:-1],chunks):
+        x[i:i+np.size(c)] = c
+    return x, start+nrows*width
+    
+
+def _writeCache(cachename, meta, columns, append=False):
+    """
+    Writes a columnar cache file.
+    
+    Each column is stored as one contiguous (aligned) block, followed by a
+    JSON footer describing the dtype and offset of every block, the footer's
+    length and a magic number. Appending new columns only rewrites the footer.
+    
+    meta: Dict of metadata, meta['columns'] is updated with the new blocks
+    columns: List of (name, array) pairs, if name is None the block is the header
+    
+    New files are written to a temporary file and moved into place, so objects still 
+    reading columns lazily from an older cache never see a half written one.
+    """
+    target = cachename if append else cachename+'.tmp'
+    with open(target, 'r+b' if append else 'wb') as f:
+        if append:
+            f.seek(meta['footer'])
+            f.truncate()
+        else:
+            f.write(_CACHE_MAGIC)
+        for name, x in columns:
+            pos = f.tell()
+            pad = -pos % _CACHE_ALIGN
+            f.write(b'\0'*pad)
+            block = [x.dtype.str, pos+pad]
+            if name is None:
+                meta['head'] = [x.dtype.descr, pos+pad]
+            else:
+                meta['columns'][name] = block
+            f.write(np.ascontiguousarray(x).tobytes())
+        meta['footer'] = f.tell()
+        footer = json.dumps(meta).encode()
+        f.write(footer)
+        f.write(struct.pack('<Q', len(footer)))
+        f.write(_CACHE_MAGIC)
+    if not append:
+        os.replace(target, cachename)
+        
+        
+def _readCacheMeta(cachename):
+    """Returns the metadata of a column cache file or None if its missing, damaged or out of date"""
+    try:
+        with open(cachename,'rb') as f:
+            if f.read(len(_CACHE_MAGIC)) != _CACHE_MAGIC:
+                return None
+            f.seek(-8-len(_CACHE_MAGIC), os.SEEK_END)
+            length = struct.unpack('<Q', f.read(8))[0]
+            if f.read(len(_CACHE_MAGIC)) != _CACHE_MAGIC:
+                return None
+            f.seek(-8-len(_CACHE_MAGIC)-length, os.SEEK_END)
+            meta = json.loads(f.read(length).decode())
+    except (IOError, OSError, ValueError, struct.error):
+        return None
+    
+    if meta.get('version') != _CACHE_VERSION:
+        return None
+    return meta
+        
+        
+def _readCacheColumns(cachename, meta, names, rows=None):
+    """
+    Memory maps a column cache file and builds a structured array from names.
+    
+    rows: (start, stop) range of rows to read, if None read them all
+    
+    Only the pages holding the requested columns (and rows) are ever read from disk.
+    """
+    if rows is None:
+        start, stop = 0, meta['nrows']
+    else:
+        start, stop = rows
+    nrows = stop - start
+    x = np.empty(nrows, dtype=[(str(i),meta['columns'][i][0]) for i in names])
+    if nrows > 0:
+        raw = np.memmap(cachename, dtype=np.uint8, mode='r')
+        for i in names:
+            dtype, offset = meta['columns'][i]
+            dtype = np.dtype(dtype)
+            offset = offset + start*dtype.itemsize
+            x[i] = raw[offset:offset+nrows*dtype.itemsize].view(dtype)
+        del raw
+    if rows is None and meta['shape'] == []:
+        x = x.reshape(())
+    return x
+    
+    
+def _readCacheColumn(cachename, meta, name, rows=None):
+    """
+    Reads the single column name from a column cache file.
+    
+    rows: (start, stop) range of rows to read, if None read them all
+    """
+    if rows is None:
+        start, stop = 0, meta['nrows']
+    else:
+        start, stop = rows
+    dtype, offset = meta['columns'][name]
+    dtype = np.dtype(dtype)
+    with open(cachename,'rb') as f:
+        f.seek(offset+start*dtype.itemsize)
+        return np.fromfile(f, dtype=dtype, count=stop-start)
+    
+    
+def _readCacheBlock(cachename, meta, name, count):
+    """Reads the count elements of the block name from a column cache file"""
+    dtype, offset = meta['columns'][name]
+    dtype = np.dtype(dtype)
+    with open(cachename,'rb') as f:
+        f.seek(offset)
+        return np.frombuffer(f.read(count*dtype.itemsize), dtype=dtype).copy()
+    
+    
+def _readCacheHead(cachename, meta, count=None):
+    """Reads the header, or if count is set a table of count headers, from a column cache file"""
+    descr, offset = meta['head']
+    dtype = np.dtype([tuple(i) for i in descr])
+    with open(cachename,'rb') as f:
+        f.seek(offset)
+        head = np.frombuffer(f.read(dtype.itemsize*(count or 1)), dtype=dtype)
+    if count is None:
+        head = head.reshape(())
+    return head.copy()
+
+
+def _parseLayout(buf):
+    """
+    Finds the layout of a MESA history or profile file.
+    
+    buf: bytes holding at least the six header lines and the first row of data
+    
+    Returns a dict with the first six lines ('lines'), the column names as 
+    genfromtxt would name them ('names'), the right hand edge of each column 
+    ('ends'), the offset of the first row of data ('start') and the length of
+    each row ('width'). Returns None if buf does not look like a fixed width file.
+    """
+    lines = []
+    pos = 0
+    for i in range(7):
+        end = buf.find(b'\n', pos)
+        if end < 0:
+            return None
+        lines.append(buf[pos:end+1])
+        pos = end+1
+    first_row = lines.pop()
+    
+    #Just the names
+    names = np.genfromtxt(BytesIO(lines[5]+first_row), names=True, max_rows=1,dtype=None,encoding='ascii')
+    names = names.dtype.names
+    ends = _fieldEnds(lines[5])
+    if len(ends) != len(names):
+        return None
+    
+    return {'lines': lines, 'names': names, 'ends': ends,
+            'start': pos-len(first_row), 'width': len(first_row)}
+    
+    
+# Columns MESA writes as integers, everything else is written as a float
+_INT_COLUMNS = re.compile(r'^(model_number|zone|num_\w+|\w*_type(_\d+)?)$')
+
+# Directives in *_columns.list that add one column per isotope, and the prefix
+# each column gets
+_ISO_DIRECTIVES = {'add_abundances': '',
+                   'add_log_abundances': 'log_',
+                   'add_center_abundances': 'center_',
+                   'add_log_center_abundances': 'log_center_',
+                   'add_surface_abundances': 'surface_',
+                   'add_log_surface_abundances': 'log_surface_',
+                   'add_average_abundances': 'average_',
+                   'add_log_average_abundances': 'log_average_',
+                   'add_total_mass': 'total_mass_',
+                   'add_log_total_mass': 'log_total_mass_'}
+                   
+# Directives in *_columns.list that add N numbered (type, top) pairs of columns
+_REGION_DIRECTIVES = {'mixing_regions': ('mix_type_', 'mix_qtop_'),
+                      'burning_regions': ('burn_type_', 'burn_qtop_'),
+                      'mix_relr_regions': ('mix_relr_type_', 'mix_relr_top_'),
+                      'burning_relr_regions': ('burn_relr_type_', 'burn_relr_top_')}
+
+
+# Columns kept as float64 when loading with precision='reduced', as float32 is 
+# not enough to tell apart neighbouring models or zones
+_PRECISE_COLUMNS = ('star_age','log_dt','star_mass','log_xmstar','time_step',
+                    'star_age_sec','mass','dq','logdq','logR','radius')
+
+# Integer columns that only hold a small set of flag values
+_TYPE_COLUMNS = re.compile(r'^\w*_type(_\d+)?$')
+
+
+def _precisionDtype(name, dtype, precision=None):
+    """
+    The dtype column name, parsed as dtype, is stored with under precision.
+    
+    precision: None keeps every column as parsed, 'reduced' stores floats as float32
+    except for those in _PRECISE_COLUMNS, or a list of the columns to keep as float64.
+    Under either reduced mode flag columns (mix_type_1 etc) are stored as int16.
+    """
+    if precision is None:
+        return dtype
+    elif isinstance(precision, str):
+        if precision != 'reduced':
+            raise ValueError("precision must be None, 'reduced' or a list of columns, got "+precision)
+        precision = _PRECISE_COLUMNS
+    
+    if dtype.kind == 'i' and _TYPE_COLUMNS.match(name):
+        return np.dtype('int16')
+    elif dtype.kind == 'f' and name not in precision:
+        return np.dtype('float32')
+    return dtype
+    
+    
+def _applyPrecision(x, precision=None):
+    """Returns the structured array x with its columns cast to their dtypes under precision"""
+    if precision is None:
+        return x
+    dtype = np.dtype([(i,_precisionDtype(i,x.dtype[i],precision)) for i in x.dtype.names])
+    if dtype == x.dtype:
+        return x
+    return x.astype(dtype)
+    
+    
+def _columnDtype(name):
+    """The dtype MESA writes column name with"""
+    if _INT_COLUMNS.match(name):
+        return np.dtype('int64')
+    return np.dtype('float64')
+    
+    
+def _readSchema(filename):
+    """
+    Reads only the six header lines of a MESA history or profile file.
+    
+    Returns (head, names) where head holds the header values and names are the
+    column names as genfromtxt would name them.
+    """
+    opener = gzip.open if filename.endswith('.gz') else open
+    with opener(filename,'rb') as f:
+        lines = [f.readline() for i in range(6)]
+    if not lines[5].strip():
+        raise ValueError(filename+" does not have a MESA header")
+        
+    head = np.genfromtxt(BytesIO(lines[1]+lines[2]), names=True,dtype=None,encoding='ascii')
+    # genfromtxt needs a row of data to name the columns
+    row = b' '.join([b'0']*len(lines[5].split()))
+    names = np.genfromtxt(BytesIO(lines[5]+row), names=True, max_rows=1,dtype=None,encoding='ascii')
+    return head, names.dtype.names
+    
+    
+def _parseColumnsList(filename, isos=None):
+    """Parses a MESA history_columns.list or profile_columns.list, see MESA.loadColumnsList"""
+    names = []
+    unresolved = []
+    with open(filename,'r') as f:
+        for l in f:
+            l = l.split('!')[0].split()
+            if len(l) == 0:
+                continue
+            key = l[0]
+            if key in _REGION_DIRECTIVES and len(l) > 1:
+                t, top = _REGION_DIRECTIVES[key]
+                for i in range(1,int(l[1])+1):
+                    names.extend([t+str(i), top+str(i)])
+            elif key in _ISO_DIRECTIVES:
+                if isos is None:
+                    unresolved.append(key)
+                else:
+                    names.extend([_ISO_DIRECTIVES[key]+i for i in isos])
+            elif key.startswith('add_'):
+                unresolved.append(key)
+            else:
+                # Entries like 'center h1' become center_h1
+                names.append('_'.join(l))
+    # MESA only writes a column once however many times it is asked for
+    return list(collections.OrderedDict.fromkeys(names)), unresolved
+    
+    
+def _parseHead(layout):
+    """Parses the header values of a file from its layout, see _parseLayout"""
+    lines = layout['lines']
+    return np.genfromtxt(BytesIO(lines[1]+lines[2]), names=True,dtype=None,encoding='ascii')
+    
+    
+def _readLayout(filename):
+    """
+    Reads just enough of filename to find its layout, see _parseLayout. Returns None for 
+    gzip'd files, which can not be read by offset, so callers fall back to reading it all.
+    """
+    if filename.endswith('.gz'):
+        return None
+    size = 65536
+    with open(filename,'rb') as f:
+        while True:
+            f.seek(0)
+            buf = f.read(size)
+            if buf.count(b'\n') >= 7 or len(buf) < size:
+                return _parseLayout(buf)
+            size = size*4
+            
+            
+def _tailLines(filename, n, start=0, block_size=65536):
+    """
+    Returns (lines, end_offset) where lines are the bytes of the last n complete
+    lines of filename, without reading the whole file.
+    
+    Plain files are scanned backwards from the end in blocks, gzip'd files are
+    streamed keeping only the last lines. Nothing before byte offset start is
+    returned. end_offset is the offset just past the last complete line.
+    """
+    if filename.endswith('.gz'):
+        with gzip.open(filename,'rb') as f:
+            f.seek(start)
+            buf = b''.join(collections.deque(f, maxlen=n+1))
+            size = f.tell() - start
+    else:
+        with open(filename,'rb') as f:
+            f.seek(0,2)
+            pos = f.tell()
+            size = pos - start
+            blocks = []
+            count = 0
+            # The line before the first one we want must end in a newline too
+            while pos > start and count <= n:
+                step = min(block_size, pos-start)
+                pos = pos - step
+                f.seek(pos)
+                blocks.append(f.read(step))
+                count = count + blocks[-1].count(b'\n')
+        buf = b''.join(blocks[::-1])
+        
+    # Ignore any partially written final line
+    end = buf.rfind(b'\n')+1
+    i = end
+    for _ in range(n):
+        i = buf.rfind(b'\n',0,max(i-1,0))+1
+        if i == 0:
+            break
+    return buf[i:end], start + size - (len(buf)-end)
+    
+    
+def _useCols(names, cols):
+    """Index of the columns to read given the list of cols asked for, or None for all of them"""
+    if not len(cols):
+        return None
+    cols = list(cols)
+    if ('model_number' not in cols and 'model_number' in names):
+        cols = cols + ['model_number']
+    if ('zone' not in cols and 'zone' in names):
+        cols = cols + ['zone']
+    colsSet = set(cols)
+    return [i for i, e in enumerate(names) if e in colsSet]
+    
+    
+def _selectNames(names, cols):
+    """The names to read given the list of cols asked for, see _useCols"""
+    usecols = _useCols(names, cols)
+    if usecols is None:
+        return list(names)
+    return [names[i] for i in usecols]
+    
+    
+def _formatColumn(x, width):
+    """
+    Formats the array x the way MESA writes it, as bytes right aligned in width
+    characters. Floats get 17 significant figures and a three digit exponent.
+    """
+    if x.dtype.kind in 'iub':
+        s = np.char.mod('%d', x)
+    elif x.dtype.kind == 'f':
+        x = x.astype(np.float64)
+        s = np.empty(np.shape(x), dtype='U24')
+        finite = np.isfinite(x)
+        parts = np.char.partition(np.char.mod('%.16E', x[finite]), 'E')
+        exponent = np.char.mod('%+04d', parts[...,2].astype(int))
+        s[finite] = np.char.add(np.char.add(parts[...,0], 'E'), exponent)
+        s[np.isnan(x)] = 'NaN'
+        s[np.isposinf(x)] = 'Infinity'
+        s[np.isneginf(x)] = '-Infinity'
+    else:
+        s = np.char.mod('%s', x)
+    return np.char.rjust(s, width).astype('S'+str(width))
+    
+    
+def _formatRows(columns, width):
+    """
+    Lays out already formatted columns (see _formatColumn) as lines of fixed width 
+    fields each followed by a space, as in MESA's output. Returns bytes.
+    """
+    nrows = np.size(columns[0])
+    buf = np.full((nrows, len(columns)*(width+1)+1), ord(' '), dtype=np.uint8)
+    for i, x in enumerate(columns):
+        pos = i*(width+1)
+        buf[:, pos:pos+width] = np.atleast_1d(x).view(np.uint8).reshape(nrows, width)
+    buf[:, -1] = ord('\n')
+    return buf.tobytes()
+    
+    
+def _scrubFixedWidth(filename):
+    """
+    Returns the lines of a fixed width history file, with the backups, retries and 
+    restarts removed, as bytes. The kept lines are copied as they are, so nothing is 
+    reformatted. Returns None if filename is not fixed width.
+    """
+    layout = _readLayout(filename)
+    if layout is None or 'model_number' not in layout['names']:
+        return None
+    with open(filename,'rb') as f:
+        buf = f.read()
+    # Ignore any partially written final line
+    body = memoryview(buf)[layout['start']:buf.rfind(b'\n')+1]
+    x = _parseFixedWidth(body, layout['ends'], layout['names'], 
+                         [list(layout['names']).index('model_number')])
+    if x is None:
+        return None
+    
+    rows = np.empty(np.size(x), dtype=[('model_number',np.int64),('row',np.int64)])
+    rows['model_number'] = x['model_number']
+    rows['row'] = np.arange(np.size(x))
+    keep = _cleanModels(rows)['row']
+    lines = np.frombuffer(body, dtype=np.uint8).reshape(-1, layout['width'])
+    return b''.join(layout['lines'])+lines[keep].tobytes()
+    
+    
+def _isColumnar(filename):
+    """True if filename is in mesaPlot's columnar format rather than MESA's text format"""
+    try:
+        with open(filename, 'rb') as f:
+            return f.read(len(_CACHE_MAGIC)) == _CACHE_MAGIC
+    except (IOError, OSError):
+        return False
+    
+    
+def _cleanModels(x):
+    """
+    Cleans history data of backups, retries and restarts, preferring to use
+    the newest data line for each model.
+    """
+    # Reverse model numbers, we want the unique elements
+    # but keeping the last not the first.
+    
+    #Fix case where we have at end of file numbers:
+    # 1 2 3 4 5 3, without this we get the extra 4 and 5
+    if np.size(x) > 1:
+        x = x[_cleanIndex(x['model_number'])]
+    return x
+    
+    
+def _cleanIndex(model):
+    """Index of the rows _cleanModels keeps given the rows' model numbers"""
+    keep = np.flatnonzero(model<=model[-1])
+    mod_rev = model[keep][::-1]
+    _, mod_ind = np.unique(mod_rev,return_index=True)
+    return keep[np.size(keep)-mod_ind-1]
+    
+    
+def _appendModels(buf, n, x):
+    """
+    Appends the rows x, read from later in the file, onto the already cleaned
+    rows buf[:n], with the same result as running _cleanModels over all the rows.
+    
+    Only rows in buf with model numbers at or past the first model in x can
+    be replaced, so the cost scales with the size of x not buf. buf is grown
+    by doubling when full.
+    
+    Returns the (possibly new) buffer and the new number of rows in use.
+    """
+    x = np.atleast_1d(_cleanModels(np.atleast_1d(x)))
+    if np.size(x) == 0:
+        return buf, n
+    
+    pos = np.searchsorted(buf['model_number'][:n], x['model_number'][0])
+    if pos < n:
+        x = np.atleast_1d(_cleanModels(np.concatenate([buf[pos:n],x])))
+        
+    n = pos + np.size(x)
+    if n > np.size(buf):
+        new = np.empty(max(n,2*np.size(buf)),dtype=buf.dtype)
+        new[:pos] = buf[:pos]
+        buf = new
+    buf[pos:n] = x
+    return buf, n
+
 
 class data(object):
     def __init__(self):
@@ -66,110 +713,383 @@ class data(object):
         self._type=''
         
     def __getattr__(self, name):
-        x=None
+        # Only called when normal lookup fails, so keep misses cheap: one dict
+        # lookup into the name table instead of trying data then head
+        attrs=self.__dict__.get('_attrs')
+        if attrs is None:
+            if not self.__dict__.get('_loaded'):
+                raise AttributeError("Must load data first")
+            attrs=self._setNames()
         
-        if '_loaded' in self.__dict__:
-            if self._loaded:
-                try:
-                    x=self.data[name]
-                except:
-                    pass
-                try:
-                    x=np.atleast_1d(self.head[name])[0]
-                except:
-                    pass
-                
-                if x is not None:
-                    return x
-                else:
-                    raise AttributeError("No value "+name+" available")
-                        
-        raise AttributeError("Must load data first")
+        source=attrs.get(name)
+        if source is None:
+            raise AttributeError("No value "+name+" available")
+        elif source=='head':
+            return np.atleast_1d(self.head[name])[0]
+        elif self.__dict__.get('_lazy') is not None:
+            return self._readColumn(name)
+        return self.data[name]
+        
+    @property
+    def data(self):
+        """The rows as a structured array, columns still to be read from a cache are read first"""
+        if self.__dict__.get('_lazy') is not None:
+            self._stackColumns()
+        return self.__dict__.get('_data')
+        
+    @data.setter
+    def data(self,x):
+        self.__dict__['_data']=x
+        self.__dict__['_lazy']=None
+        
+    def _setLazy(self,cachename,meta,names,rows=None,precision=None):
+        """
+        Sets the data to the columns names of a column cache file, without reading them.
+        
+        Each column is read the first time it is asked for as an attribute (self.logT), 
+        the whole structured array is only built if self.data is used.
+        """
+        self.data=None
+        self._lazy={'filename':cachename,
+                    'ino':os.stat(cachename).st_ino,
+                    'meta':meta,
+                    'names':list(names),
+                    'rows':rows,
+                    'precision':precision,
+                    'columns':{}}
+        
+    def _readColumn(self,name):
+        lazy=self._lazy
+        x=lazy['columns'].get(name)
+        if x is not None:
+            return x
+        
+        filename,meta=lazy['filename'],lazy['meta']
+        try:
+            ino=os.stat(filename).st_ino
+        except OSError:
+            ino=None
+        if ino!=lazy['ino']:
+            # The cache (or archive) was rebuilt, fine as long as it still holds the same data
+            meta=_readCacheMeta(filename)
+            if (meta is None or 
+                any(meta.get(i)!=lazy['meta'].get(i) for i in ('fingerprint','fingerprints','files')) or
+                meta['columns'].get(name,[None])[0]!=lazy['meta']['columns'][name][0]):
+                raise IOError(filename+" changed since it was loaded, reload the data")
+            lazy['meta'],lazy['ino']=meta,ino
+        
+        x=_readCacheColumn(filename,meta,name,lazy['rows'])
+        x=x.astype(_precisionDtype(name,x.dtype,lazy['precision']),copy=False)
+        if lazy['rows'] is None and meta['shape']==[]:
+            x=x.reshape(())
+        lazy['columns'][name]=x
+        return x
+        
+    def _stackColumns(self):
+        """Reads any columns not yet read and builds self.data from them"""
+        lazy=self._lazy
+        columns=[self._readColumn(i) for i in lazy['names']]
+        x=np.empty(np.shape(columns[0]) if len(columns) else 0,
+                    dtype=[(str(i),c.dtype) for i,c in zip(lazy['names'],columns)])
+        for i,c in zip(lazy['names'],columns):
+            x[i]=c
+        self.data=x
+        
+    def _nbytes(self):
+        """Size of the rows, including columns not yet read"""
+        lazy=self.__dict__.get('_lazy')
+        if lazy is None:
+            return np.atleast_1d(self.data).nbytes
+        rows=lazy['rows'] or (0,lazy['meta']['nrows'])
+        itemsize=sum(_precisionDtype(i,np.dtype(lazy['meta']['columns'][i][0]),lazy['precision']).itemsize 
+                        for i in lazy['names'])
+        return itemsize*(rows[1]-rows[0])
     
     def __dir__(self):
-        x=[]
-        try:
-            if len(self.head_names)>0:
-                x=x+list(self.head_names)
-        except:
-            pass
-        try:
-            if len(self.data_names)>0:
-                x=x+list(self.data_names)
-        except:
-            pass
-
-        if len(x)>0:
-            return x
+        attrs=self.__dict__.get('_attrs')
+        if attrs is None and self.__dict__.get('_loaded'):
+            attrs=self._setNames()
+        if attrs:
+            return list(attrs)
         else:
             raise AttributeError
             
-    def __getitem__(self,key):
-        tmp=data()
-        if key > np.size(self.data[self.data_names[0]]):
-            raise IndexError
-        elif key <0:
-            x=self.data[key-1:key]
+    def _setNames(self):
+        """
+        Sets head_names, data_names and the table __getattr__ uses to map a name to
+        where it is stored. Head values take precedence over data columns of the
+        same name. Must be called whenever head or data are replaced by arrays
+        with different fields.
+        
+        Returns the table.
+        """
+        head_names=getattr(getattr(self.head,'dtype',None),'names',None)
+        if self.__dict__.get('_lazy') is not None:
+            data_names=tuple(self._lazy['names'])
         else:
-            x=self.data[key:key+1]
+            data_names=getattr(getattr(self.data,'dtype',None),'names',None)
+        if head_names is not None:
+            self.head_names=head_names
+        if data_names is not None:
+            self.data_names=data_names
+        attrs=dict.fromkeys(data_names or (),'data')
+        attrs.update(dict.fromkeys(head_names or (),'head'))
+        self._attrs=attrs
+        return attrs
+            
+    def __getitem__(self,key):
+        """
+        Returns a new data object holding the selected rows.
+        
+        key can be an int, a slice, a boolean mask or an array of indices. Ints,
+        slices and masks that select a contiguous run of rows return views that
+        share the parent's buffers and header, anything else is a copy.
+        """
+        x=np.atleast_1d(self.data)
+        size=np.size(x)
+        if isinstance(key,slice):
+            return self._view(x[key])
+        elif isinstance(key,(int,np.integer)):
+            if key < 0:
+                key=key+size
+            if key < 0 or key >= size:
+                raise IndexError("Row "+str(key)+" out of range for "+str(size)+" rows")
+            return self._view(x[key:key+1])
+        
+        key=np.asarray(key)
+        if key.dtype==bool:
+            if np.shape(key)!=np.shape(x):
+                raise IndexError("Boolean mask must have one entry per row")
+            key=np.flatnonzero(key)
+        if np.size(key)>0 and key.ndim==1 and np.issubdtype(key.dtype,np.integer):
+            key=np.where(key<0,key+size,key)
+            if np.all(np.diff(key)==1) and key[0]>=0 and key[-1]<size:
+                return self._view(x[key[0]:key[-1]+1])
+        return self._view(x[key])
+        
+    def modelRange(self,start=None,end=None):
+        """
+        Returns a view of the rows with start <= model_number <= end.
+        
+        Requires the rows to be sorted by model_number (as loadHistory leaves them).
+        Optional:
+        start: First model to include, defaults to the first model
+        end: Last model to include, defaults to the last model
+        """
+        model=np.atleast_1d(self.data['model_number'])
+        i=0 if start is None else np.searchsorted(model,start,side='left')
+        j=np.size(model) if end is None else np.searchsorted(model,end,side='right')
+        return self[i:max(i,j)]
         
-        tmp.data=np.array(x,dtype=self.data.dtype)
+    def _view(self,x):
+        """Wraps the rows x in a data object sharing this object's header"""
+        tmp=data()
+        tmp.data=x
         tmp.head=self.head
         tmp._loaded=True
         tmp._mph=self._mph
+        tmp._type=self._type
         tmp.data_names=self.data_names
         tmp.head_names=self.head_names
+        tmp._attrs=self.__dict__.get('_attrs')
         return tmp
         
+    def _saveFile(self,filename,fingerprint,parsed=None):
+        """
+        Writes the loaded data to a column cache file next to filename.
+        
+        parsed: dtype the data had before any precision policy was applied, columns
+        stored with less precision are listed in the cache so that later loads wanting
+        more precision know to reparse them
+        """
+        try:
+            self._writeColumnar(filename+'.mpcache', fingerprint, parsed)
+        except (IOError, OSError):
+            # Can't write next to the file, so just don't cache it
+            pass
+            
+    def _writeColumnar(self, cachename, fingerprint=None, parsed=None):
+        """Writes the loaded data to cachename in the column cache format, see _saveFile"""
+        meta = {'version': _CACHE_VERSION,
+                'fingerprint': fingerprint,
+                'nrows': int(np.size(self.data)),
+                'shape': list(np.shape(self.data)),
+                'file_names': list(self._file_names),
+                'end_offset': self.__dict__.get('_end_offset'),
+                'columns': {},
+                'parsed': {}}
+        if parsed is not None:
+            meta['parsed'] = {i: parsed[i].str for i in self.data_names 
+                              if parsed[i] != self.data.dtype[i]}
+        x = np.atleast_1d(self.data)
+        _writeCache(cachename, meta, [(None,self.head)]+[(i,x[i]) for i in self.data_names])
+            
+    def _loadCache(self, filename, cols, loader, fingerprint, silent=False, precision=None):
+        """
+        Load data from filename's column cache, if the cache is valid.
+        
+        The cache is valid if its stored fingerprint matches fingerprint (or
+        filename no longer exists). Columns asked for that are not yet in the
+        cache, or are stored with less precision than precision asks for, are 
+        parsed from filename and appended to the cache.
+        
+        Returns True if the data was loaded from the cache, False if the caller
+        must reparse filename.
+        """
+        cachename = filename+'.mpcache'
+        meta = _readCacheMeta(cachename)
+        if meta is None:
+            return False
+        
+        file_exists = fingerprint is not None
+        if file_exists and meta['fingerprint'] != fingerprint:
+            if not silent:
+                print("Cache of "+filename+" is out of date, reparsing")
+            return False
+        
+        file_names = meta['file_names']
+        names = _selectNames(file_names, cols)
+            
+        parsed = meta.setdefault('parsed', {})
+        missing = []
+        for i in names:
+            if i not in meta['columns']:
+                missing.append(i)
+                continue
+            stored = np.dtype(meta['columns'][i][0])
+            want = _precisionDtype(i, np.dtype(parsed.get(i, stored)), precision)
+            if not np.can_cast(want, stored, casting='safe'):
+                missing.append(i)
+                
+        if len(missing):
+            if not file_exists:
+                return False
+            x = data()
+            loader(x, filename, cols=missing)
+            if np.size(x.data) != meta['nrows']:
+                return False
+            x_data = np.atleast_1d(x.data)
+            x_cast = _applyPrecision(x_data, precision)
+            for i in missing:
+                parsed.pop(i, None)
+                if x_cast.dtype[i] != x_data.dtype[i]:
+                    parsed[i] = x_data.dtype[i].str
+            try:
+                _writeCache(cachename, meta, 
+                            [(i,x_cast[i]) for i in missing], append=True)
+            except (IOError, OSError):
+                return False
         
-    def _saveFile(self,filename):
-        filehash = _hash(filename)
-        pickname = filename+'.pickle' 
-        with open(filename+'.pickle','wb') as f:
-            pickle.dump(filehash, f)
-            pickle.dump(self, f)
+        self.head = _readCacheHead(cachename, meta)
+        self._setLazy(cachename, meta, names, precision=precision)
+        self._file_names = file_names
+        self._fingerprint = meta['fingerprint']
+        self._end_offset = meta['end_offset']
+        self._setNames()
+        self._loaded = True
+        return True
         
+    def _getLoader(self,_dbg=False):
+        if StrictVersion(np.__version__) < StrictVersion('1.10.0') or _dbg:
+            return data._loadFile1
+        elif StrictVersion(np.__version__) < StrictVersion('1.14.0'):
+            return data._loadFile2
+        else:
+            return data._loadFile4
         
     def loadFile(self, filename, max_num_lines=-1, 
                     cols=[],final_lines=-1,_dbg=False,
                     use_pickle=True,reload_pickle=False,silent=False,
-                    is_mod=False):
-                    
+                    is_mod=False,cache_check='stat',schema_only=False,precision=None,
+                    workers=1,fingerprint=None):
+        """
+        Reads a MESA history or profile file.
+        
+        use_pickle: If true, cache the parsed columns in filename.mpcache and reuse
+        them on the next load if filename has not changed.
+        reload_pickle: If true, ignore any existing cache and rebuild it
+        cache_check: How to decide if filename has changed since it was cached,
+        either 'stat' (size, mtime and inode), 'sample' (hash of the start and
+        end of the file) or 'full' (hash of the whole file)
+        
+        schema_only: If true, only read the six header lines. The header values are
+        loaded as normal, data is an empty array with the column names and the
+        dtypes MESA writes them with.
+        precision: None keeps every column as parsed. 'reduced' stores floats as 
+        float32 except for precision critical columns like star_age and log_dt, and flag 
+        columns like mix_type_1 as int16. Can also be a list of the columns to keep 
+        as float64. The cache stores the reduced columns, and reparses them if a later
+        load asks for more precision.
+        workers: If >1, parse a fixed width file in chunks with this many processes
+        fingerprint: The fingerprint of filename under cache_check, if the caller has already made it
+        silent: If true, do not print when a cache is out of date
+        
+        Partial reads (max_num_lines or final_lines) are never cached.
+        """
+        self._attrs = None
         if is_mod:
             self._loadMod(filename)
             return
+        elif schema_only:
+            self._loadSchema(filename)
+            self.data = _applyPrecision(self.data, precision)
+            return
+        
+        loader = self._getLoader(_dbg)
+        
+        if _isColumnar(filename):
+            self._loadColumnar(filename, cols, precision)
+            if final_lines > 0:
+                self.data = np.atleast_1d(self.data)[-final_lines:]
+            elif max_num_lines > 0:
+                self.data = np.atleast_1d(self.data)[:max_num_lines]
+            return
+        
+        # Fingerprint before parsing, so a file that changes while we read it
+        # fails the next cache check
+        if fingerprint is None:
+            fingerprint = _fingerprint(filename, cache_check)
+        self._fingerprint = fingerprint
+        self._end_offset = None
+        
+        use_cache = use_pickle and max_num_lines <= 0 and final_lines <= 0
+        if use_cache and not reload_pickle:
+            if self._loadCache(filename, cols, loader, fingerprint, silent, precision):
+                return
 
-        pickname = filename+'.pickle'    
-        if use_pickle and os.path.exists(pickname) and not reload_pickle:
-            with open(pickname,'rb') as f:
-                # Get checksum
-                filehash = _hash(filename)
-                try:
-                    pickhash = pickle.load(f)
-                except:
-                    raise ValueError("Pickle file corrupted please delete it and try again")
-                if (os.path.exists(filename) and pickhash == filehash) or not os.path.exists(filename):
-                    # Data has not changed
-
-                    # Get Data
-                    x = pickle.load(f)
-                    self.data = x.data
-                    self.head = x.head
-                    self.head_names = x.head.dtype.names
-                    self.data_names = x.data.dtype.names
-                    self._loaded = x._loaded
-                    return
-
-        if StrictVersion(np.__version__) < StrictVersion('1.10.0') or _dbg:
-            f = self._loadFile1
-        elif StrictVersion(np.__version__) < StrictVersion('1.14.0'):
-            f = self._loadFile2
+        if workers > 1 and loader == data._loadFile4:
+            self._loadFile4(filename, max_num_lines, cols, final_lines, workers=workers)
         else:
-            f = self._loadFile3
-        f(filename, max_num_lines, cols, final_lines)
-        self._saveFile(filename)
+            loader(self, filename, max_num_lines, cols, final_lines)
+        parsed = self.data.dtype
+        self.data = _applyPrecision(self.data, precision)
+        if use_cache:
+            self._saveFile(filename, fingerprint, parsed)
             
         
+    def _loadColumnar(self, filename, cols=[], precision=None):
+        """Reads a file written by _writeColumnar, for instance by MESA.scrubHistory"""
+        meta = _readCacheMeta(filename)
+        if meta is None:
+            raise ValueError(filename+" is damaged or was written by a different version of mesaPlot")
+        names = _selectNames(meta['file_names'], cols)
+        self.head = _readCacheHead(filename, meta)
+        self._setLazy(filename, meta, names, precision=precision)
+        self._file_names = meta['file_names']
+        self._fingerprint = _fingerprint(filename)
+        self._end_offset = None
+        self._setNames()
+        self._loaded = True
+        
+    def _loadSchema(self, filename):
+        self.head, names = _readSchema(filename)
+        self.data = np.empty(0, dtype=[(i,_columnDtype(i)) for i in names])
+        self._file_names = names
+        self._fingerprint = None
+        self._end_offset = None
+        self._setNames()
+        self._loaded = True
+        
     def _loadFile1(self, filename, max_num_lines=-1, cols=[],final_lines=-1):
         numLines = self._filelines(filename)
         self.head = np.genfromtxt(filename, skip_header=1, skip_footer=numLines-4, names=True,dtype=None)
@@ -193,12 +1113,12 @@ class data(object):
             usecols = [i for i, e in enumerate(names) if e in colsSet]
         
         if final_lines > 0:    
-            line = subprocess.check_output(['tail', '-'+str(final_lines), filename])
+            line, _ = _tailLines(filename, final_lines)
             self.data = np.genfromtxt(BytesIO(line), names=names, usecols=usecols,dtype=None)
         else:
             self.data = np.genfromtxt(filename, skip_header=5, names=True, skip_footer=skip_lines, usecols=usecols,dtype=None)
-        self.head_names = self.head.dtype.names
-        self.data_names = self.data.dtype.names
+        self._file_names = names
+        self._setNames()
         self._loaded = True
         
         
@@ -222,15 +1142,15 @@ class data(object):
             usecols = [i for i, e in enumerate(names) if e in colsSet]
             
         if final_lines > 0:    
-            line = subprocess.check_output(['tail', '-'+str(final_lines), filename])
+            line, _ = _tailLines(filename, final_lines)
             self.data = np.genfromtxt(BytesIO(line), names=names, usecols=usecols,dtype=None)
         else:
             if max_num_lines > 0:
                 self.data = np.genfromtxt(filename, skip_header=5, names=True, max_rows = max_num_lines, usecols=usecols,dtype=None)
             else:
                 self.data = np.genfromtxt(filename, skip_header=5, names=True, usecols=usecols,dtype=None)
-        self.head_names = self.head.dtype.names
-        self.data_names = self.data.dtype.names
+        self._file_names = names
+        self._setNames()
         self._loaded = True
 
     def _loadFile3(self, filename, max_num_lines=-1, cols=[],final_lines=-1):
@@ -253,21 +1173,131 @@ class data(object):
             usecols = [i for i, e in enumerate(names) if e in colsSet]
             
         if final_lines > 0:    
-            line = subprocess.check_output(['tail', '-'+str(final_lines), filename])
+            line, _ = _tailLines(filename, final_lines)
             self.data = np.genfromtxt(BytesIO(line), names=names, usecols=usecols,dtype=None,encoding='ascii')
         else:
             if max_num_lines > 0:
                 self.data = np.genfromtxt(filename, skip_header=5, names=True, max_rows = max_num_lines, usecols=usecols,dtype=None,encoding='ascii')
             else:
                 self.data = np.genfromtxt(filename, skip_header=5, names=True, usecols=usecols,dtype=None,encoding='ascii')
-        self.head_names = self.head.dtype.names
-        self.data_names = self.data.dtype.names
+        self._file_names = names
+        self._setNames()
+        self._loaded = True
+        
+    def _loadFile4(self, filename, max_num_lines=-1, cols=[],final_lines=-1,workers=1):
+        # Read the file once and then slice the fixed width columns out of the buffer
+        if filename.endswith('.gz'):
+            return self._loadFile3(filename, max_num_lines, cols, final_lines)
+        elif workers > 1 and final_lines <= 0:
+            layout = _readLayout(filename)
+            if layout is not None:
+                x, end_offset = _parseParallel(filename, layout, _useCols(layout['names'], cols),
+                                               max_num_lines, workers)
+                if x is not None:
+                    self.head = _parseHead(layout)
+                    return self._setData(x, layout['names'], end_offset)
+            return self._loadFile3(filename, max_num_lines, cols, final_lines)
+        elif final_lines > 0:
+            # Only read the header and the end of the file
+            layout = _readLayout(filename)
+            if layout is None:
+                return self._loadFile3(filename, max_num_lines, cols, final_lines)
+            body, end_offset = _tailLines(filename, final_lines, layout['start'])
+        else:
+            with open(filename,'rb') as f:
+                buf = f.read()
+                
+            layout = _parseLayout(buf)
+            if layout is None:
+                return self._loadFile3(filename, max_num_lines, cols, final_lines)
+            
+            # Ignore any partially written final line, slicing a view rather than copying the file
+            end_offset = buf.rfind(b'\n')+1
+            body = memoryview(buf)[layout['start']:end_offset]
+            del buf
+        
+        self.head = _parseHead(layout)
+        
+        names = layout['names']
+        usecols = _useCols(names, cols)
+        
+        if max_num_lines > 0 and final_lines <= 0:
+            body = body[:max_num_lines*layout['width']]
+            # Following carries on after the last line read, not the end of the file
+            end_offset = layout['start']+len(body)
+        
+        x = _parseFixedWidth(body, layout['ends'], names, usecols)
+        if x is None:
+            return self._loadFile3(filename, max_num_lines, cols, final_lines)
+        self._setData(x, names, end_offset)
+        
+    def _setData(self, x, names, end_offset):
+        # Match genfromtxt which returns a 0-d array for a single line
+        if np.size(x) == 1:
+            x = x.reshape(())
+        
+        self.data = x
+        self._file_names = names
+        self._end_offset = end_offset
+        self._setNames()
         self._loaded = True
 
 
-    def _loadMod(self,filename):
-        from io import BytesIO, StringIO
+    def iterFile(self, filename, cols=[], chunk_size=100000):
+        """
+        Generator that reads the body of a MESA history or profile file in chunks, 
+        so files larger than memory can be processed.
+        
+        Required:
+        filename: Path to file to read
+        
+        Optional:
+        cols: If none returns all columns, else if set as a list only those columns (plus model_number or zone)
+        chunk_size: Maximum number of lines in each chunk
+        
+        Yields:
+        Structured arrays of at most chunk_size lines, in file order. Backups, retries and
+        restarts are not removed, see MESA.iterateHistory for that.
         
+        Sets self.head and self.head_names before the first chunk.
+        """
+        layout = _readLayout(filename)
+        if layout is None:
+            # Not fixed width, so we can only read it all at once
+            x = data()
+            x.loadFile(filename,cols=cols,use_pickle=False)
+            self.head = x.head
+            self.head_names = x.head_names
+            self._attrs = None
+            self._file_names = x._file_names
+            x = np.atleast_1d(x.data)
+            for i in range(0,np.size(x),chunk_size):
+                yield x[i:i+chunk_size]
+            return
+        
+        self.head = _parseHead(layout)
+        self.head_names = self.head.dtype.names
+        self._attrs = None
+        self._file_names = layout['names']
+        usecols = _useCols(layout['names'], cols)
+        width = layout['width']
+        
+        with open(filename,'rb') as f:
+            f.seek(layout['start'])
+            while True:
+                buf = f.read(chunk_size*width)
+                # Ignore any partially written final line
+                buf = buf[:len(buf)-len(buf)%width]
+                if len(buf) == 0:
+                    return
+                x = _parseFixedWidth(buf, layout['ends'], layout['names'], usecols)
+                if x is None:
+                    raise ValueError("Lines in "+filename+" are not all the same width")
+                yield x
+
+
+    def _loadMod(self,filename):
+
         count=0
         with open(filename,'r') as f:
             for l in f:
@@ -302,30 +1332,49 @@ class data(object):
         self.head = np.genfromtxt(StringIO(' '.join(head)),
                     names=head_names,dtype=None,encoding='ascii',converters=d)
             
-        d = {k:self._fds2f for k in range(len(data_names))}    
-
-        data = np.genfromtxt(filename,skip_header=count,
+        data = self._readModBody(filename,count,data_names)
+        if data is None:
+            d = {k:self._fds2f for k in range(len(data_names))}
+            old = np.genfromtxt(filename,skip_header=count,
                         names=data_names,skip_footer=5,dtype=None,converters=d,encoding='ascii')
+            data = np.zeros(np.shape(old),dtype=old.dtype.descr + [('mass',('<f8'))])
+            for i in old.dtype.names:
+                data[i] = old[i]
 
         # Add mass co-ord
+        data['mass'] = np.cumsum(data['dq'][::-1])[::-1] * self.head['star_mass']
+        self.data = data
 
-        mass = np.cumsum(data['dq'][::-1])[::-1] * self.head['star_mass']
-
-        olddt = data.dtype
-        newdt = np.dtype(olddt.descr + [('mass',('<f8'))])
+        self._setNames()
+        self._loaded = True
 
-        newarr = np.zeros(np.shape(data),dtype=newdt)
-        for i in olddt.names:
-            newarr[i] = data[i]
-        
-        newarr['mass'] = mass
-        self.data = newarr
 
+    def _readModBody(self,filename,count,data_names):
+        """Parse the zone data of a .mod file in one pass.
 
-        self.head_names = self.head.dtype.names
-        self.data_names = self.data.dtype.names
-        self._loaded = True
+        Swaps the Fortran D exponents for E across the whole body and hands it
+        to numpy in a single call, returning an all-float structured array with
+        space for the mass column. Returns None if the values do not line up
+        with the names, so the caller can fall back to genfromtxt.
+        """
+        with open(filename,'rb') as f:
+            buf = f.read()
+        lines = buf.split(b'\n',count)
+        if len(lines) <= count:
+            return None
+        # Match genfromtxt's skip_footer, which ignores blank lines
+        rows = [l for l in lines[count].split(b'\n') if l.strip()][:-5]
+        if len(rows) == 0:
+            return None
+        values = np.fromstring(b' '.join(rows).replace(b'D',b'E'),sep=' ')
+        ncols = len(data_names)
+        if values.size != len(rows)*ncols:
+            return None
 
+        names = np.genfromtxt(BytesIO(rows[0]),names=data_names,max_rows=1).dtype.names
+        data = np.empty(len(rows),dtype=[(i,'<f8') for i in names]+[('mass','<f8')])
+        data.view(np.float64).reshape(len(rows),ncols+1)[:,:ncols] = values.reshape(len(rows),ncols)
+        return data
 
     def _filelines(self,filename):
         """Get the number of lines in a file."""
@@ -344,7 +1393,7 @@ class data(object):
         else:
             f = x.decode().replace("'","").replace('D','E')
         try:
-            f = np.float(f)
+            f = float(f)
         except ValueError:
             pass
 
@@ -499,16 +1548,101 @@ class data(object):
         return np.max(self.data['mass'][ind]) 
 
 
-class MESA(object):
-    def __init__(self):
-        self.hist=data()
-        self.prof=data()
+def _promoteDtype(arrays, names):
+    """Dtype with the fields names, each promoted so it can hold that field from every one of arrays"""
+    dtype = []
+    for i in names:
+        t = arrays[0].dtype[i]
+        for x in arrays[1:]:
+            t = np.promote_types(t, x.dtype[i])
+        dtype.append((i,t))
+    return np.dtype(dtype)
+    
+    
+def _loadProfileWorker(args):
+    """Loads one profile, see MESA.loadProfiles"""
+    filename,cols,use_pickle,reload_pickle,cache_check,precision,fingerprint,silent=args
+    x=data()
+    x.loadFile(filename,cols=cols,use_pickle=use_pickle,reload_pickle=reload_pickle,
+                silent=silent,cache_check=cache_check,precision=precision,fingerprint=fingerprint)
+    return x
+
+
+class _LRUCache(object):
+    """
+    Least recently used cache, limited by both the total size of its values in 
+    bytes and the number of values. Keeps count of hits, misses and evictions.
+    """
+    def __init__(self,max_bytes,max_items=None):
+        self.max_bytes=max_bytes
+        self.max_items=max_items
+        self.clear()
+        
+    def clear(self):
+        self._items=collections.OrderedDict()
+        self.nbytes=0
+        self.hits=0
+        self.misses=0
+        self.evictions=0
+        
+    def __len__(self):
+        return len(self._items)
+        
+    def __contains__(self,key):
+        return key in self._items
+        
+    def get(self,key,count=True):
+        """Returns the value for key or None, count=False does not record a miss"""
+        try:
+            value,nbytes=self._items.pop(key)
+        except KeyError:
+            if count:
+                self.misses=self.misses+1
+            return None
+        # Re-insert to mark as most recently used
+        self._items[key]=(value,nbytes)
+        self.hits=self.hits+1
+        return value
+        
+    def put(self,key,value,nbytes):
+        if key in self._items:
+            self.nbytes=self.nbytes-self._items.pop(key)[1]
+        self._items[key]=(value,nbytes)
+        self.nbytes=self.nbytes+nbytes
+        self.trim()
+        
+    def trim(self):
+        """Evict the least recently used values until within the limits"""
+        while len(self._items) and (self.nbytes>self.max_bytes or 
+                    (self.max_items is not None and len(self._items)>self.max_items)):
+            _,(_,nbytes)=self._items.popitem(last=False)
+            self.nbytes=self.nbytes-nbytes
+            self.evictions=self.evictions+1
+            
+    def remove(self,func):
+        """Removes every value whose key satisfies func(key)"""
+        for key in [k for k in self._items if func(k)]:
+            self.nbytes=self.nbytes-self._items.pop(key)[1]
+            
+    def stats(self):
+        return {'hits':self.hits,'misses':self.misses,'evictions':self.evictions,
+                'entries':len(self._items),'bytes':self.nbytes}
+
+
+class MESA(object):
+    def __init__(self):
+        self.hist=data()
+        self.prof=data()
         self.binary=data()
         self.prof_ind=""
         self.log_fold=""
-        self.clearProfCache()
-        self.cache_limit=100
-        self._cache_wd=''
+        # Profile cache is limited to cache_limit profiles and cache_size bytes
+        self._cache_prof=_LRUCache(max_bytes=2**30,max_items=100)
+        self._archives={}
+        self._prof_ind_cache={}
+        self.cache_check='stat'
+        # Precision policy for loaded data, see data.loadFile
+        self.precision=None
     
         self.hist._mph='history'
         self.prof._mph='profile'
@@ -520,7 +1654,8 @@ class MESA(object):
         
     
     def loadHistory(self,f="",filename_in=None,max_model=-1,max_num_lines=-1,cols=[],
-                    final_lines=-1,_dbg=False,use_pickle=True,reload_pickle=False):
+                    final_lines=-1,_dbg=False,use_pickle=True,reload_pickle=False,follow=False,
+                    workers=1,silent=False):
         """
         Reads a MESA history file.
         
@@ -532,6 +1667,11 @@ class MESA(object):
         max_num_lines: Maximum number of lines to read from the file, maps ~maximum model number but not quite (retires, backups and restarts effect this)
         cols: If none returns all columns, else if set as a list only stores those columns, will always add model_number to the list
         final_lines: Reads number of lines from end of the file if > 0
+        follow: If true, remember where the file ended. The next call with follow=True (and the same
+        file, cols, max_model, max_num_lines and final_lines) only parses the lines after those already read, 
+        useful for watching a running model.
+        workers: If >1, parse the file in chunks with this many processes, for very large histories
+        silent: If true, do not print when the history's cache is out of date
         
         
         Returns:
@@ -554,41 +1694,208 @@ class MESA(object):
             filename=os.path.join(self.log_fold,'history.data')
         else:
             filename=filename_in
+            
+        follow_args=(filename,max_model,list(cols),max_num_lines,final_lines)
+        if follow and self._followHistory(*follow_args):
+            return
 
         self.hist.loadFile(filename,max_num_lines,cols,final_lines=final_lines,_dbg=_dbg,
-                            use_pickle=use_pickle,reload_pickle=reload_pickle)
+                            use_pickle=use_pickle,reload_pickle=reload_pickle,
+                            cache_check=self.cache_check,precision=self.precision,
+                            workers=workers,silent=silent)
+        
+        # Only model_number is needed to see if any rows go, so a history read lazily 
+        # from its cache stays that way when there is nothing to clean
+        model=np.atleast_1d(self.hist.model_number)
+        keep=np.arange(np.size(model))
+        if max_model>0:
+            keep=keep[model[keep]<=max_model]
+        if np.size(keep)>1:
+            keep=keep[_cleanIndex(model[keep])]
+        if not np.array_equal(keep,np.arange(np.size(model))):
+            if max_model>0:
+                self.hist.data=self.hist.data[self.hist.model_number<=max_model]
+            self.hist.data=_cleanModels(self.hist.data)
+        
+        self.hist._follow=None
+        if follow:
+            self._startFollow(*follow_args)
+            
+    def _startFollow(self,filename,max_model,cols,max_num_lines=-1,final_lines=-1):
+        """Remember where history.data ended so _followHistory can pick up from there"""
+        end_offset=self.hist._end_offset
+        if end_offset is None:
+            return
+        layout=_readLayout(filename)
+        if layout is None:
+            return
+        names=list(layout['names'])
+        self.hist._follow={'filename':filename,
+                           'ino':os.stat(filename).st_ino,
+                           'offset':end_offset,
+                           'args':(max_model,list(cols),max_num_lines,final_lines),
+                           'ends':layout['ends'],
+                           'names':layout['names'],
+                           'usecols':[names.index(i) for i in self.hist.data_names]}
+        self.hist._follow_buf=np.atleast_1d(self.hist.data)
+        self.hist._follow_n=np.size(self.hist.data)
+        
+    def _followHistory(self,filename,max_model,cols,max_num_lines=-1,final_lines=-1):
+        """
+        Parses only the lines appended to filename since the last follow load.
+        
+        Returns False if a full reload is needed instead (first call, different 
+        arguments, or the file has been replaced or truncated).
+        """
+        state=self.hist.__dict__.get('_follow')
+        if state is None or state['filename']!=filename or state['args']!=(max_model,list(cols),max_num_lines,final_lines):
+            return False
+        
+        try:
+            st=os.stat(filename)
+        except OSError:
+            return False
+        if st.st_ino!=state['ino'] or st.st_size<state['offset']:
+            return False
+        
+        with open(filename,'rb') as f:
+            f.seek(state['offset'])
+            new=f.read()
+        # Ignore any partially written final line
+        new=new[:new.rfind(b'\n')+1]
+        if len(new)==0:
+            return True
+        
+        x=_parseFixedWidth(new,state['ends'],state['names'],state['usecols'])
+        buf=self.hist._follow_buf
+        if x is None or x.dtype.names!=buf.dtype.names:
+            return False
+        x=_applyPrecision(x,self.precision)
+        if x.dtype!=buf.dtype:
+            if not np.can_cast(x.dtype,buf.dtype,casting='safe'):
+                return False
+            x=x.astype(buf.dtype)
+        state['offset']=state['offset']+len(new)
         
         if max_model>0:
-            self.hist.data=self.hist.data[self.hist.model_number<=max_model]
+            x=x[x['model_number']<=max_model]
+        
+        buf,n=_appendModels(buf,self.hist._follow_n,x)
+        self.hist._follow_buf=buf
+        self.hist._follow_n=n
+        self.hist.data=buf[:n]
+        return True
+        
+    def iterateHistory(self,f="",filename_in=None,max_model=-1,cols=[],chunk_size=100000):
+        """
+        Generator that reads a MESA history file in chunks, for histories too large to fit in memory.
+        
+        Optional:
+        f: Folder in which history.data exists, if not present uses self.log_fold, if that is
+        not set try the current working directory.
+        filename_in: Reads the file given by name
+        max_model: Maximum model to read into
+        cols: If none returns all columns, else if set as a list only stores those columns, will always add model_number to the list
+        chunk_size: Number of lines of the file to read at once, each chunk yielded has at most this many rows
+        
+        Yields:
+        Structured arrays of history data, cleaned of backups, retries and restarts 
+        in the same way as loadHistory. self.hist.head is set before the first chunk.
+        
+        The file is read twice, the first pass only keeps model_number (8 bytes a line) to 
+        work out which lines survive the cleaning.
+        """
+        if len(f)==0:
+            if len(self.log_fold)==0:
+                self.log_fold='LOGS/'
+            f=self.log_fold
+        else:
+            self.log_fold=f+"/"
 
-        # Reverse model numbers, we want the unique elements
-        # but keeping the last not the first.
+        if filename_in is None:               
+            filename=os.path.join(self.log_fold,'history.data')
+        else:
+            filename=filename_in
+        
+        mods=[x['model_number'] for x in self.hist.iterFile(filename,cols=['model_number'],chunk_size=chunk_size)]
+        if len(mods)==0:
+            return
+        mods=np.concatenate(mods)
+        
+        rows=np.zeros(np.size(mods),dtype=[('model_number',mods.dtype),('row',np.int64)])
+        rows['model_number']=mods
+        rows['row']=np.arange(np.size(mods))
+        keep=np.zeros(np.size(mods),dtype='bool')
+        del mods
+        if max_model>0:
+            rows=rows[rows['model_number']<=max_model]
+        keep[np.atleast_1d(_cleanModels(rows))['row']]=True
+        del rows
+        
+        start=0
+        for x in self.hist.iterFile(filename,cols=cols,chunk_size=chunk_size):
+            k=keep[start:start+np.size(x)]
+            start=start+np.size(x)
+            if np.any(k):
+                yield x[:np.size(k)][k]
+            if start>=np.size(keep):
+                return
+        
+    def scrubHistory(self,f="",fileOut="LOGS/history.data.scrubbed",binary=False,chunk_size=10000):
+        """
+        Writes a copy of the history with the backups, retries and restarts removed.
+        
+        Optional:
+        f: Folder in which history.data exists, see loadHistory
+        fileOut: File to write to
+        binary: If true, write in mesaPlot's columnar format instead of MESA's text format,
+        loadFile (and so loadHistory) can read either
+        chunk_size: Number of lines formatted at once when writing text
+        
+        Text output of a fixed width history copies the kept lines byte for byte, without 
+        loading the history, otherwise the cleaned data is formatted a column at a time.
+        """
+        if len(f)==0:
+            if len(self.log_fold)==0:
+                self.log_fold='LOGS/'
+            f=self.log_fold
+        else:
+            self.log_fold=f+"/"
         
-        #Fix case where we have at end of file numbers:
-        # 1 2 3 4 5 3, without this we get the extra 4 and 5
-        if np.size(self.hist.model_number) > 1:
-            self.hist.data=self.hist.data[self.hist.model_number<=self.hist.model_number[-1]]
-            mod_rev=self.hist.model_number[::-1]
-            _, mod_ind=np.unique(mod_rev,return_index=True)
-            self.hist.data=self.hist.data[np.size(self.hist.model_number)-mod_ind-1]
+        # Fixed width text is copied straight from the file, without loading the history
+        if not binary:
+            lines=_scrubFixedWidth(os.path.join(self.log_fold,'history.data'))
+            if lines is not None:
+                with open(fileOut,'wb') as out:
+                    out.write(lines)
+                return
         
-    def scrubHistory(self,f="",fileOut="LOGS/history.data.scrubbed"):
         self.loadHistory(f)
-        with open(fileOut,'w') as f:
-            print(' '.join([str(i) for i in range(1,np.size(self.hist.head_names)+1)]),file=f)
-            print(' '.join([str(i) for i in self.hist.head_names]),file=f)
-            print(' '.join([str(self.hist.head[i]) for i in self.hist.head_names]),file=f)
-            print(" ",file=f)
-            print(' '.join([str(i) for i in range(1,np.size(self.hist.data_names)+1)]),file=f)
-            print(' '.join([str(i) for i in self.hist.data_names]),file=f)
-            for j in range(np.size(self.hist.data)):
-                print(' '.join([str(self.hist.data[i][j]) for i in self.hist.data_names]),file=f)    
-    
+        if binary:
+            self.hist._writeColumnar(fileOut)
+            return
+            
+        head_names=self.hist.head_names
+        data_names=self.hist.data_names
+        data=np.atleast_1d(self.hist.data)
+        with open(fileOut,'wb') as f:
+            # Column numbers, names and then values, as one line each
+            f.write(_formatRows(list(_formatColumn(np.arange(1,len(head_names)+1),28)[:,None]),28))
+            f.write(_formatRows(list(_formatColumn(np.array(head_names),28)[:,None]),28))
+            f.write(_formatRows([_formatColumn(np.atleast_1d(self.hist.head[i]),28) for i in head_names],28))
+            f.write(b'\n')
+            f.write(_formatRows(list(_formatColumn(np.arange(1,len(data_names)+1),40)[:,None]),40))
+            f.write(_formatRows(list(_formatColumn(np.array(data_names),40)[:,None]),40))
+            for i in range(0,np.size(data),chunk_size):
+                rows=data[i:i+chunk_size]
+                f.write(_formatRows([_formatColumn(rows[j],40) for j in data_names],40))
+        
         
     def loadProfile(self,f='',num=None,prof=None,mode='nearest',silent=False,cache=True,cols=[],
                     use_pickle=True,reload_pickle=False):
         if num is None and prof is None:
-            self._readProfile(f) #f is a filename
+            self._readProfile(f,cache=cache,cols=cols,use_pickle=use_pickle,
+                                reload_pickle=reload_pickle,silent=silent) #f is a filename
             return
         
         if len(f)==0:
@@ -599,43 +1906,152 @@ class MESA(object):
             self.log_fold=f
             
         self._loadProfileIndex(f) #Assume f is a folder
-        prof_nums=np.atleast_1d(self.prof_ind["profile"]).astype('int')
-        
-        if prof is not None:
-            pos=np.where(prof_nums==prof)[0][0]
-        else:
-            if np.count_nonzero(self.prof_ind)==1:
-                pos=0
-            else:
-                if num<=0:
-                    pos=num
-                else:
-                #Find profile with mode 'nearest','upper','lower','first','last'
-                    pos = bisect.bisect_left(self.prof_ind["model"], num)
-                    if pos == 0 or mode=='first':
-                        pos=0
-                    elif pos == np.size(self.prof_ind["profile"]) or mode=='last':
-                        pos=-1
-                    elif mode=='lower':
-                        pos=pos-1
-                    elif mode=='upper':
-                        pos=pos
-                    elif mode=='nearest':
-                        if self.prof_ind["model"][pos]-num < num-self.prof_ind["model"][pos-1]:
-                            pos=pos
-                        else:
-                            pos=pos-1
-                    else:
-                        raise ValueError("Invalid mode")
-                        
-        profile_num=np.atleast_1d(self.prof_ind["profile"])[pos]        
-        filename=f+"/profile"+str(int(profile_num))+".data"
+        filename=f+"/profile"+str(self._findProfile(num,prof,mode))+".data"
         if not silent:
             print(filename)
         self._readProfile(filename,cache=cache,cols=cols,
                             use_pickle=use_pickle,reload_pickle=reload_pickle,silent=silent)
         return
             
+    def _findProfile(self,num=None,prof=None,mode='nearest'):
+        """
+        Returns the profile number in self.prof_ind for profile number prof, or
+        for the model closest to num using mode 'nearest','upper','lower','first' or 'last'
+        """
+        prof_nums=self.prof_ind["profile"].astype('int')
+        
+        if prof is not None:
+            return int(prof_nums[np.where(prof_nums==prof)[0][0]])
+        return int(self._findProfiles([num],mode)[0])
+        
+    def _findProfiles(self,nums,mode='nearest'):
+        """
+        Vectorised lookup of the profile numbers for the models closest to each of nums,
+        using mode 'nearest','upper','lower','first' or 'last'. Values <=0 index from
+        the end of profiles.index.
+        """
+        if mode not in ['nearest','upper','lower','first','last']:
+            raise ValueError("Invalid mode")
+            
+        nums=np.atleast_1d(nums)
+        models,profiles=self._prof_ind_sorted
+        size=np.size(models)
+        if size==1:
+            return np.repeat(profiles,np.size(nums))
+        
+        found=np.searchsorted(models,nums,side='left')
+        below=np.maximum(found-1,0)
+        above=np.minimum(found,size-1)
+        if mode=='last':
+            pos=np.zeros(np.size(nums),dtype='int')+size-1
+        elif mode=='lower':
+            pos=below
+        elif mode=='upper':
+            pos=above
+        else:
+            pos=np.where(models[above]-nums < nums-models[below],above,below)
+        # Models after the last or before the first profile
+        pos=np.where(found==size,size-1,pos)
+        pos=np.where((found==0)|(mode=='first'),0,pos)
+        
+        # Non-positive numbers index from the end of the file
+        ind=np.where(nums<=0,nums.astype('int') % size,-1)
+        return np.where(nums<=0,self.prof_ind['profile'][ind].astype('int'),profiles[pos])
+        
+    def _selectProfiles(self,priority=None,rng=[-1.0,-1.0],step=1):
+        """
+        Returns the rows of self.prof_ind with a priority in priority (0 matches all) and a 
+        model in the range rng=[min,max] every step models (or if rng has more than two values, 
+        a model in rng)
+        """
+        ind=self.prof_ind
+        mask=np.ones(np.size(ind),dtype='bool')
+        if priority is not None:
+            if type(priority) is not list: priority = [ priority ]
+            if 0 not in priority:
+                mask=mask&np.isin(ind["priority"],priority)
+        if len(rng)==2 and rng[0]>0:
+            mask=mask&(ind["model"]>=rng[0])&(ind["model"]<=rng[1])&(np.remainder(ind["model"]-rng[0],step)==0)
+        elif len(rng)>2 and rng[0]>0:
+            mask=mask&np.isin(ind["model"],rng)
+        return ind[mask]
+        
+    def loadProfiles(self,f='',models=None,profs=None,mode='nearest',cols=[],workers=1,cache=True,
+                    use_pickle=True,reload_pickle=False):
+        """
+        Reads many MESA profiles, parsing them in parallel.
+        
+        Optional:
+        f: Folder in which profiles.index exists, if not present uses self.log_fold
+        models: List of model numbers, each is matched to a profile as in loadProfile(num=..,mode=mode)
+        profs: List of profile numbers to load
+        If neither models or profs are set then every profile in profiles.index is loaded
+        cols: If none returns all columns, else if set as a list only storing those columns, it will always add zone to the list of columns
+        workers: Number of processes used to parse profiles, 1 parses them in this process
+        cache: If true adds the profiles to the profile cache, and reuses any already cached
+        
+        Returns:
+        List of data objects, one per model (or profile) in the order they were asked for.
+        self.prof is not changed.
+        """
+        if len(f)==0:
+            if len(self.log_fold)==0:
+                self.log_fold='LOGS/'
+            f=self.log_fold
+        else:
+            self.log_fold=f
+            
+        self._loadProfileIndex(f)
+        if models is not None:
+            profs=self._findProfiles(models,mode)
+        elif profs is None:
+            profs=self.prof_ind["profile"].astype('int')
+        filenames=[f+"/profile"+str(int(i))+".data" for i in profs]
+        
+        res=[None]*len(filenames)
+        fingerprints=[_fingerprint(i,self.cache_check) for i in filenames]
+        jobs=[]
+        for i,filename in enumerate(filenames):
+            if not reload_pickle:
+                if cache:
+                    res[i]=self._getProfCache(filename,cols,fingerprints[i])
+                if res[i] is None:
+                    res[i]=self._loadFromArchive(filename,cols,fingerprints[i])
+                    if res[i] is not None and cache:
+                        self._addProfCache(filename,cols,res[i])
+            if res[i] is None:
+                jobs.append(i)
+        
+        args=[(filenames[i],cols,use_pickle,reload_pickle,self.cache_check,self.precision,fingerprints[i],True) for i in jobs]
+        loaded=_poolMap(_loadProfileWorker,args,workers)
+            
+        for i,x in zip(jobs,loaded):
+            res[i]=x
+            if cache:
+                self._addProfCache(filenames[i],cols,x)
+        return res
+            
+    def loadColumnsList(self,filename,isos=None):
+        """
+        Reads the columns a MESA run will write from its history_columns.list or
+        profile_columns.list, without needing any output from the run.
+        
+        Required:
+        filename: Path to the *_columns.list file
+        
+        Optional:
+        isos: List of isotopes in the run's network, used to expand directives like
+        add_center_abundances. If None those directives are not expanded
+        
+        Returns:
+        (names, unresolved) where names is the list of column names and unresolved 
+        the list of add_* directives that could not be expanded.
+        
+        MESA adds some columns regardless of the list (zone in profiles), these are not
+        included.
+        """
+        return _parseColumnsList(filename,isos)
+        
     def loadMod(self,filename=None):
         """
         Read a MESA .mod file.
@@ -645,7 +2061,19 @@ class MESA(object):
         self.mod.loadFile(filename,is_mod=True)
         
         
-    def iterateProfiles(self,f="",priority=None,rng=[-1.0,-1.0],step=1,cache=True,silent=False):
+    def iterateProfiles(self,f="",priority=None,rng=[-1.0,-1.0],step=1,cache=True,silent=False,prefetch=0,cols=[]):
+        """
+        Generator that loads each selected profile in turn into self.prof.
+        
+        Optional:
+        f: Folder in which profiles.index exists, if not present uses self.log_fold
+        priority: Only load profiles with these priorities, 0 matches any priority
+        rng: Either [min,max] model range, of which every step'th model is loaded, or a list of more than two models
+        cache: If true caches the profile data so multiple profile loads do not need to reread the data
+        prefetch: If >0, this many background processes parse the next profiles
+        while the caller works on the current one
+        cols: If empty loads all columns, else only these columns (see loadProfile)
+        """
         if len(f)==0:
             if len(self.log_fold)==0:
                 self.log_fold='LOGS/'
@@ -654,29 +2082,243 @@ class MESA(object):
             self.log_fold=f
         #Load profiles index file
         self._loadProfileIndex(f)
-        for x in self.prof_ind:
-            if priority != None:
-                if type(priority) is not list: priority = [ priority ]
-                if x["priority"] in priority or 0 in priority:
-                    self.loadProfile(f=f+"/profile"+str(int(x["profile"]))+".data",cache=cache,silent=silent)
-                    yield
-            if len(rng)==2 and rng[0]>0:
-                if x["model"] >=rng[0] and x["model"] <= rng[1] and np.remainder(x["model"]-rng[0],step)==0:
-                    self.loadProfile(f=f+"/profile"+str(int(x["profile"]))+".data",cache=cache,silent=silent)
-                    yield
-                elif x["model"]>rng[1]:
-                    return
-            elif len(rng)>2 and rng[0]>0:
-                if x["model"] in rng:
-                    self.loadProfile(f=f+"/profile"+str(int(x["profile"]))+".data",cache=cache,silent=silent)
-                    yield
-            else:
-                self.loadProfile(f=f+"/profile"+str(int(x["profile"]))+".data",cache=cache,silent=silent)
-                yield 
+        filenames=[f+"/profile"+str(int(x["profile"]))+".data" for x in self._selectProfiles(priority,rng,step)]
+        
+        if prefetch<=0:
+            for filename in filenames:
+                self.loadProfile(f=filename,cache=cache,silent=silent,cols=cols)
+                yield
+            return
+        
+        # Not _poolMap, jobs are only started as the caller gets through the profiles and 
+        # any still running are thrown away if the caller stops early
+        pool=multiprocessing.Pool(prefetch)
+        try:
+            pending=collections.deque()
+            upcoming=iter(filenames)
+            for i in filenames:
+                # Keep the current profile plus prefetch more queued
+                while len(pending)<=prefetch:
+                    filename=next(upcoming,None)
+                    if filename is None:
+                        break
+                    pending.append((filename,self._startProfileLoad(pool,filename,cache,cols,silent)))
+                filename,job=pending.popleft()
+                self.prof=self._finishProfileLoad(filename,job,cache,cols)
+                yield
+        finally:
+            pool.terminate()
         return
+        
+    def _startProfileLoad(self,pool,filename,cache,cols=[],silent=False):
+        """Returns the profile from the cache or archive if possible, otherwise starts parsing it in pool"""
+        fingerprint=_fingerprint(filename,self.cache_check)
+        x=None
+        if cache:
+            x=self._getProfCache(filename,cols,fingerprint)
+            if x is not None:
+                return x
+        x=self._loadFromArchive(filename,cols,fingerprint)
+        if x is not None:
+            if cache:
+                self._addProfCache(filename,cols,x)
+            return x
+        return pool.apply_async(_loadProfileWorker,((filename,cols,True,False,self.cache_check,self.precision,fingerprint,silent),))
+        
+    def _finishProfileLoad(self,filename,job,cache,cols=[]):
+        if isinstance(job,data):
+            # Already in the cache (if caching)
+            return job
+        x=job.get()
+        if cache:
+            self._addProfCache(filename,cols,x)
+        return x
                 
     def _loadProfileIndex(self,f):
-        self.prof_ind=np.genfromtxt(f+"/profiles.index",skip_header=1,names=["model","priority","profile"])
+        """
+        Loads f/profiles.index into self.prof_ind, only reparsing it when it changes.
+        """
+        filename=f+"/profiles.index"
+        fingerprint=_fingerprint(filename,self.cache_check)
+        if fingerprint is None:
+            archive=self._profileArchive(f)
+            if archive is not None:
+                self._setProfileIndex(archive['index'])
+                return
+        
+        key=os.path.abspath(filename)
+        if key in self._prof_ind_cache and self._prof_ind_cache[key][0]==fingerprint:
+            self.prof_ind,self._prof_ind_sorted=self._prof_ind_cache[key][1:]
+            return
+        
+        self._setProfileIndex(np.genfromtxt(filename,skip_header=1,names=["model","priority","profile"]))
+        self._prof_ind_cache[key]=(fingerprint,self.prof_ind,self._prof_ind_sorted)
+        
+    def _setProfileIndex(self,ind):
+        self.prof_ind=np.atleast_1d(ind)
+        # Sorted by model for searchsorted lookups, profiles.index is not sorted after a restart
+        order=np.argsort(self.prof_ind["model"],kind='stable')
+        self._prof_ind_sorted=(self.prof_ind["model"][order],self.prof_ind["profile"][order].astype('int'))
+        
+    def packProfiles(self,f='',filename=None):
+        """
+        Packs every profile in profiles.index into a single column archive.
+        
+        Each data column of every profile is stored back to back in one block, with a table 
+        of offsets to where each profile starts, a table of the profile headers and the 
+        contents of profiles.index. Afterwards loadProfile and iterateProfiles transparently 
+        read profiles from the archive, unless the profile file has changed since it was packed.
+        
+        Optional:
+        f: Folder in which profiles.index exists, if not present uses self.log_fold
+        filename: Name of archive to write, defaults to f/profiles.mparchive
+        
+        Returns:
+        The archive's filename
+        
+        All profiles must have the same columns, otherwise raises ValueError.
+        """
+        if len(f)==0:
+            if len(self.log_fold)==0:
+                self.log_fold='LOGS/'
+            f=self.log_fold
+        if filename is None:
+            filename=os.path.join(f,'profiles.mparchive')
+            
+        self._loadProfileIndex(f)
+        index=self.prof_ind
+        files=[os.path.join(f,"profile"+str(int(i))+".data") for i in index['profile']]
+        
+        # Work out where each profile goes without parsing them
+        layouts=[_readLayout(i) for i in files]
+        if any(i is None for i in layouts):
+            raise ValueError("Can only pack fixed width profiles")
+        names=layouts[0]['names']
+        if any(i['names']!=names for i in layouts):
+            raise ValueError("All profiles must have the same columns to be packed")
+        nrows=[(os.path.getsize(i)-l['start'])//l['width'] for i,l in zip(files,layouts)]
+        offsets=np.concatenate([[0],np.cumsum(nrows)]).astype(np.int64)
+        
+        first=data()
+        first._loadFile4(files[0])
+        dtype=np.atleast_1d(first.data).dtype
+        
+        meta={'version': _CACHE_VERSION,
+              'nrows': int(offsets[-1]),
+              'shape': [int(offsets[-1])],
+              'file_names': list(names),
+              'files': [os.path.basename(i) for i in files],
+              'fingerprints': [_fingerprint(i,self.cache_check) for i in files],
+              'columns': {}}
+        
+        # Written beside the old archive and swapped in at the end, so profiles already read 
+        # lazily from the old archive keep its inode and notice the change
+        tmp=filename+'.tmp'
+        with open(tmp,'wb') as out:
+            out.write(_CACHE_MAGIC)
+            pos=out.tell()
+            for i in names:
+                pos=pos+(-pos % _CACHE_ALIGN)
+                meta['columns'][i]=[dtype[i].str,pos]
+                pos=pos+int(offsets[-1])*dtype[i].itemsize
+            out.truncate(pos)
+            meta['footer']=pos
+            
+            # One profile in memory at a time
+            heads=[]
+            for i,fname in enumerate(files):
+                x=first if i==0 else data()
+                if i>0:
+                    x._loadFile4(fname)
+                x_data=np.atleast_1d(x.data)
+                if np.size(x_data)!=nrows[i]:
+                    raise ValueError("Could not pack "+fname+", it has a partially written line")
+                heads.append(x.head)
+                for j in names:
+                    if not np.can_cast(x_data.dtype[j],dtype[j]):
+                        raise ValueError("Column "+j+" in "+fname+" has a different type to the first profile")
+                    out.seek(meta['columns'][j][1]+offsets[i]*dtype[j].itemsize)
+                    out.write(x_data[j].astype(dtype[j]).tobytes())
+            del first
+        
+        # Headers may differ in the length of their strings
+        if any(i.dtype.names!=heads[0].dtype.names for i in heads):
+            raise ValueError("All profiles must have the same header fields to be packed")
+        head_dtype=_promoteDtype(heads,heads[0].dtype.names)
+        head_table=np.empty(len(heads),dtype=head_dtype)
+        for i,h in enumerate(heads):
+            head_table[i]=h.astype(head_dtype)
+        
+        _writeCache(tmp,meta,[(None,head_table),('/offsets',offsets)]+
+                    [('/'+i,np.asarray(index[i],dtype=np.float64)) for i in index.dtype.names],append=True)
+        os.replace(tmp,filename)
+        self._archives.pop(os.path.abspath(f),None)
+        # Cached profiles may still point into the old archive
+        self.clearProfCache(f)
+        return filename
+        
+    def _profileArchive(self,f):
+        """
+        Returns the profile archive in folder f as a dict (or None if there is no archive), 
+        only rereading its metadata when the archive changes.
+        """
+        filename=os.path.join(f,'profiles.mparchive')
+        fingerprint=_fingerprint(filename)
+        if fingerprint is None:
+            return None
+        key=os.path.abspath(f)
+        archive=self._archives.get(key)
+        if archive is not None and archive['fingerprint']==fingerprint:
+            return archive
+        
+        meta=_readCacheMeta(filename)
+        if meta is None or 'files' not in meta:
+            return None
+        nprof=len(meta['files'])
+        index=np.zeros(nprof,dtype=[('model',np.float64),('priority',np.float64),('profile',np.float64)])
+        for i in index.dtype.names:
+            index[i]=_readCacheBlock(filename,meta,'/'+i,nprof)
+        archive={'filename':filename,
+                 'fingerprint':fingerprint,
+                 'meta':meta,
+                 'files':dict((j,i) for i,j in enumerate(meta['files'])),
+                 'offsets':_readCacheBlock(filename,meta,'/offsets',nprof+1),
+                 'head':_readCacheHead(filename,meta,nprof),
+                 'index':index}
+        self._archives[key]=archive
+        return archive
+        
+    def _loadFromArchive(self,filename,cols,fingerprint=None):
+        """
+        Returns the profile filename from its folder's archive, or None if its not in an up to date archive.
+        
+        fingerprint: filename's fingerprint if the caller already has it
+        """
+        archive=self._profileArchive(os.path.dirname(filename) or '.')
+        if archive is None:
+            return None
+        i=archive['files'].get(os.path.basename(filename))
+        if i is None:
+            return None
+        meta=archive['meta']
+        if fingerprint is None:
+            fingerprint=_fingerprint(filename,self.cache_check)
+        if fingerprint is not None and fingerprint!=meta['fingerprints'][i]:
+            return None
+        
+        file_names=meta['file_names']
+        names=_selectNames(file_names,cols)
+        
+        x=data()
+        x.head=archive['head'][i].copy().reshape(())
+        x._setLazy(archive['filename'],meta,names,
+                    rows=(archive['offsets'][i],archive['offsets'][i+1]),precision=self.precision)
+        x._file_names=file_names
+        x._fingerprint=meta['fingerprints'][i]
+        x._end_offset=None
+        x._setNames()
+        x._loaded=True
+        return x
 
     def _readProfile(self,filename,cache=True,cols=[],use_pickle=True,reload_pickle=False,silent=False):
         """
@@ -696,28 +2338,90 @@ class MESA(object):
         self.prof.data_names: List of names of the data fields
         """
         
-        # Handle cases where we change directories inside the python session
-        if self._cache_wd != os.getcwd():
-            self.clearProfCache()
-            self._cache_wd=os.getcwd()
+        # Fingerprint once for every cache this load checks
+        fingerprint=_fingerprint(filename,self.cache_check)
+        x=None
+        if cache and not reload_pickle:
+            x=self._getProfCache(filename,cols,fingerprint)
+        if x is None:
+            if not reload_pickle:
+                x=self._loadFromArchive(filename,cols,fingerprint)
+            if x is None:
+                x=data()
+                x.loadFile(filename,cols=cols,use_pickle=use_pickle,reload_pickle=reload_pickle,silent=silent,
+                            cache_check=self.cache_check,precision=self.precision,fingerprint=fingerprint)
+            if cache:
+                self._addProfCache(filename,cols,x)
+        self.prof=x
         
+    def _profCacheKey(self,filename,cols,fingerprint):
+        if len(cols):
+            cols=frozenset(cols)
+        else:
+            cols=None
+        precision=self.precision
+        if precision is not None and not isinstance(precision,str):
+            precision=frozenset(precision)
+        return (os.path.abspath(filename),fingerprint,cols,precision)
+            
+    def _getProfCache(self,filename,cols,fingerprint=None):
+        """
+        Returns the cached profile for filename (as it is now on disk) with at least the columns cols, 
+        or None if its not cached.
         
-        if filename in self._cache_prof_name and cache:
-            self.prof=self._cache_prof[self._cache_prof_name.index(filename)]
+        fingerprint: filename's fingerprint if the caller already has it
+        """
+        if fingerprint is None:
+            fingerprint=_fingerprint(filename,self.cache_check)
+        x=None
+        if len(cols):
+            # A profile with every column can stand in for one with only some
+            x=self._cache_prof.get(self._profCacheKey(filename,[],fingerprint),count=False)
+        if x is None:
+            x=self._cache_prof.get(self._profCacheKey(filename,cols,fingerprint))
+        return x
+            
+    def _addProfCache(self,filename,cols,x):
+        key=self._profCacheKey(filename,cols,x._fingerprint)
+        # Drop anything cached from older versions of this file
+        self._cache_prof.remove(lambda k: k[0]==key[0] and k[1]!=key[1])
+        self._cache_prof.put(key,x,x._nbytes()+x.head.nbytes)
+            
+    def clearProfCache(self,path=None):
+        """
+        Clears the profile cache.
+        
+        path: If set, only clears profiles from this file or from files inside this folder
+        """
+        if path is None:
+            self._cache_prof.clear()
         else:
-            x=data()
-            x.loadFile(filename,cols=cols,use_pickle=use_pickle,reload_pickle=reload_pickle,silent=silent)
-            if cache:
-                if len(self._cache_prof_name)==self.cache_limit:
-                    self._cache_prof.pop(0)
-                    self._cache_prof_name.pop(0)
-                self._cache_prof.append(x)
-                self._cache_prof_name.append(filename)
-            self.prof=x
+            path=os.path.abspath(path)
+            self._cache_prof.remove(lambda k: k[0]==path or k[0].startswith(os.path.join(path,'')))
             
-    def clearProfCache(self):
-        self._cache_prof=[]
-        self._cache_prof_name=[]
+    def profCacheStats(self):
+        """Returns a dict of the profile cache's hits, misses, evictions, entries and size in bytes"""
+        return self._cache_prof.stats()
+        
+    @property
+    def cache_limit(self):
+        """Maximum number of profiles to cache"""
+        return self._cache_prof.max_items
+        
+    @cache_limit.setter
+    def cache_limit(self,value):
+        self._cache_prof.max_items=value
+        self._cache_prof.trim()
+        
+    @property
+    def cache_size(self):
+        """Maximum size in bytes of the profiles cached"""
+        return self._cache_prof.max_bytes
+        
+    @cache_size.setter
+    def cache_size(self,value):
+        self._cache_prof.max_bytes=value
+        self._cache_prof.trim()
         
     def abun(self,element):
         xx=0
@@ -762,21 +2466,257 @@ class MESA(object):
         else:
             filename=filename_in
 
-        self.binary.loadFile(filename,max_num_lines,cols)
+        self.binary.loadFile(filename,max_num_lines,cols,cache_check=self.cache_check,precision=self.precision)
         
         if max_model>0:
             self.binary.data=self.binary.data[self.binary.model_number<=max_model]
 
-        # Reverse model numbers, we want the unique elements
-        # but keeping the last not the first.
+        self.binary.data=_cleanModels(self.binary.data)
+
+
+def _loadHistoryWorker(args):
+    """Loads one run's history, see MESAGrid.loadHistory"""
+    folder,cols,max_model,cache_check,precision=args
+    m=MESA()
+    m.cache_check=cache_check
+    m.precision=precision
+    m.loadHistory(f=folder,cols=cols,max_model=max_model,silent=True)
+    return m.hist
+
+
+# Ways a history column can be reduced to one value per run in MESAGrid.summarise
+_REDUCTIONS = {'first': lambda x: x[0],
+               'last': lambda x: x[-1],
+               'min': np.min,
+               'max': np.max,
+               'mean': np.mean,
+               'sum': np.sum}
+
+
+def _summariseWorker(args):
+    """Reduces one run's history to a row of the summary index, see MESAGrid.summarise"""
+    folder,spec,cache_check=args
+    cols=[src for name,src,how in spec if how!='head']
+    m=MESA()
+    m.cache_check=cache_check
+    m.loadHistory(f=folder,cols=cols or ['model_number'],silent=True)
+    x=np.atleast_1d(m.hist.data)
+    row=[]
+    for name,src,how in spec:
+        # Runs without the column (or with no models yet) get a NaN
+        if how=='head':
+            if src in m.hist.head_names:
+                row.append(np.atleast_1d(m.hist.head[src])[0])
+            else:
+                row.append(np.nan)
+        elif src in m.hist.data_names and np.size(x)>0:
+            row.append(_REDUCTIONS[how](x[src]))
+        else:
+            row.append(np.nan)
+    return row
+
+
+class MESAGrid(object):
+    def __init__(self,root='.'):
+        """
+        A grid of MESA runs, found by looking for history.data files under root.
+        
+        Optional:
+        root: Folder to search for runs
         
-        #Fix case where we have at end of file numbers:
-        # 1 2 3 4 5 3, without this we get the extra 4 and 5
-        self.binary.data=self.binary.data[self.binary.model_number<=self.binary.model_number[-1]]
+        Sets:
+        self.runs: Sorted list of the LOGS folders found, a run's run_id is its index in this list
+        """
+        self.root=root
+        self.hist=data()
+        self.heads=None
+        self.offsets=None
+        self.summary=None
+        self.cache_check='stat'
+        # Precision policy for loaded data, see data.loadFile
+        self.precision=None
+        self.findRuns()
+        
+    def findRuns(self):
+        """Searches self.root for folders holding a history.data, storing them in self.runs"""
+        runs=[]
+        for dirpath,dirnames,filenames in os.walk(self.root):
+            if 'history.data' in filenames:
+                runs.append(dirpath)
+                # A run's LOGS folder doesn't hold other runs
+                dirnames[:]=[]
+            else:
+                dirnames.sort()
+        self.runs=sorted(runs)
+        return self.runs
         
-        mod_rev=self.binary.model_number[::-1]
-        _, mod_ind=np.unique(mod_rev,return_index=True)
-        self.binary.data=self.binary.data[np.size(self.binary.model_number)-mod_ind-1]
+    def loadHistory(self,cols=[],max_model=-1,workers=1):
+        """
+        Loads the history of every run in self.runs into one table.
+        
+        Optional:
+        cols: If none loads every column common to all runs, else only those columns
+        (plus model_number). Every run must have them
+        max_model: Maximum model to read for each run
+        workers: Number of processes to parse the histories with
+        
+        Each history is cleaned of backups, retries and restarts, and reuses its
+        history.data.mpcache like MESA.loadHistory.
+        
+        Sets:
+        self.hist.data: Structured array of every run's history one after another, with an
+        extra run_id column giving the index of the run in self.runs
+        self.offsets: Run i is self.hist.data[self.offsets[i]:self.offsets[i+1]]
+        self.heads: Structured array of the header values common to all runs, one row per run
+        """
+        if len(self.runs)==0:
+            raise ValueError("No MESA runs found in "+str(self.root))
+        args=[(i,cols,max_model,self.cache_check,self.precision) for i in self.runs]
+        hists=_poolMap(_loadHistoryWorker,args,workers)
+        
+        names=[i for i in hists[0].data_names if all(i in x.data_names for x in hists[1:])]
+        if len(cols):
+            for i in cols:
+                if i not in names:
+                    missing=[r for r,x in zip(self.runs,hists) if i not in x.data_names]
+                    raise ValueError("Column "+i+" is not in the history of "+', '.join(missing))
+        head_names=[i for i in hists[0].head_names if all(i in x.head_names for x in hists[1:])]
+        
+        datas=[np.atleast_1d(x.data) for x in hists]
+        sizes=[np.size(x) for x in datas]
+        self.offsets=np.concatenate([[0],np.cumsum(sizes)]).astype(np.int64)
+        
+        dtype=_promoteDtype(datas,names)
+        table=np.empty(self.offsets[-1],dtype=[('run_id',np.int32)]+[(i,dtype[i]) for i in names])
+        for i,x in enumerate(datas):
+            rows=table[self.offsets[i]:self.offsets[i+1]]
+            rows['run_id']=i
+            for j in names:
+                rows[j]=x[j]
+        
+        heads=[np.atleast_1d(x.head) for x in hists]
+        self.heads=np.empty(len(heads),dtype=_promoteDtype(heads,head_names))
+        for j in head_names:
+            self.heads[j]=np.concatenate([x[j] for x in heads])
+        
+        self.hist=data()
+        self.hist.data=table
+        # Header values differ between runs, they are in self.heads instead
+        self.hist.head={}
+        self.hist.head_names=()
+        self.hist._mph='history'
+        self.hist._setNames()
+        self.hist._loaded=True
+        
+    def summarise(self,reductions,workers=1,update=True):
+        """
+        Loads the summary index of the grid, a table of one row per run, stored in 
+        root/grid.mpsummary.
+        
+        Required:
+        reductions: Dict of name:(source,how) giving the summary values, how is one of 
+        'first', 'last', 'min', 'max', 'mean' or 'sum' to reduce the history column source,
+        or 'head' for the header value source. For instance 
+        {'final_mass':('star_mass','last'), 'max_Tc':('log_center_T','max')}
+        
+        Optional:
+        workers: Number of processes to read the histories with
+        update: If true, only rereads the histories of runs that are new or have changed 
+        since the index was written (per self.cache_check). If false, the index is used as
+        is without looking at any run
+        
+        Sets:
+        self.summary: Structured array with a run column (the LOGS folder) and one column per reduction
+        """
+        spec=sorted([name,src,how] for name,(src,how) in reductions.items())
+        for name,src,how in spec:
+            if how!='head' and how not in _REDUCTIONS:
+                raise ValueError("Unknown reduction "+str(how)+" for "+name)
+        filename=os.path.join(self.root,'grid.mpsummary')
+        names=[i[0] for i in spec]
+        
+        meta=_readCacheMeta(filename)
+        if meta is not None and meta.get('reductions')!=spec:
+            meta=None
+        if not update:
+            if meta is None:
+                raise ValueError("No summary index of these reductions in "+str(self.root))
+            x=_readCacheColumns(filename,meta,names)
+            self.summary=self._summaryTable(meta['runs'],names,[x[i] for i in names])
+            return
+        
+        old={}
+        if meta is not None:
+            x=_readCacheColumns(filename,meta,names)
+            for i,(run,fingerprint) in enumerate(zip(meta['runs'],meta['fingerprints'])):
+                old[run]=(fingerprint,x[i].tolist())
+        
+        runs=[os.path.relpath(i,self.root) for i in self.runs]
+        fingerprints=[_fingerprint(os.path.join(i,'history.data'),self.cache_check) for i in self.runs]
+        jobs=[i for i,run in enumerate(runs) if old.get(run,(None,))[0]!=fingerprints[i]]
+        
+        args=[(self.runs[i],spec,self.cache_check) for i in jobs]
+        new=_poolMap(_summariseWorker,args,workers)
+        
+        rows=[None if i is None else i[1] for i in (old.get(run) for run in runs)]
+        for i,row in zip(jobs,new):
+            rows[i]=row
+        columns=[np.array([row[j] for row in rows]) for j in range(len(spec))]
+        self.summary=self._summaryTable(runs,names,columns)
+        
+        if len(jobs)==0 and meta is not None and meta['runs']==runs:
+            return
+        meta={'version': _CACHE_VERSION,
+              'reductions': spec,
+              'runs': runs,
+              'fingerprints': fingerprints,
+              'nrows': len(runs),
+              'shape': [len(runs)],
+              'columns': {}}
+        try:
+            _writeCache(filename,meta,[(i,self.summary[i]) for i in names])
+        except (IOError, OSError):
+            # Can't write to the grid, so just don't keep the index
+            pass
+            
+    def _summaryTable(self,runs,names,columns):
+        runs=[os.path.join(self.root,i) for i in runs]
+        x=np.empty(len(runs),dtype=[('run',str,max([len(i) for i in runs]+[1]))]+
+                                   [(i,c.dtype) for i,c in zip(names,columns)])
+        x['run']=runs
+        for i,c in zip(names,columns):
+            x[i]=c
+        return x
+        
+    def query(self,**ranges):
+        """
+        Returns the list of runs whose summary values match, see summarise.
+        
+        Each keyword is a summary column and either a (min,max) range, where None leaves 
+        that side open, or a value to match exactly. For instance 
+        query(final_mass=(None,1.5),version_number=11569)
+        """
+        if self.summary is None:
+            raise ValueError("Must load the summary index first with summarise")
+        keep=np.ones(np.size(self.summary),dtype=bool)
+        for name,rng in ranges.items():
+            x=self.summary[name]
+            if isinstance(rng,(tuple,list)):
+                low,high=rng
+                if low is not None:
+                    keep&=x>=low
+                if high is not None:
+                    keep&=x<=high
+            else:
+                keep&=x==rng
+        return [str(i) for i in self.summary['run'][keep]]
+        
+    def run(self,i):
+        """Returns the history of run i as a data object, its rows are a view of self.hist"""
+        x=self.hist[int(self.offsets[i]):int(self.offsets[i+1])]
+        x.head=self.heads[i]
+        x._setNames()
+        return x
 
 
 class inlist(object):
@@ -24,10 +24,12 @@ from matplotlib.ticker import MaxNLocator,AutoMinorLocator
 import matplotlib.patheffects as path_effects
 import os
 import random
+import hashlib
 from io import BytesIO
 from cycler import cycler
 from scipy.interpolate import interp1d
 from distutils.spawn import find_executable
+from mesaPlot.file_reader import _LRUCache
 
     
 class plot(object):
@@ -97,6 +99,13 @@ class plot(object):
         self.msun=1.9892*10**33
         self.secyear=60.0*60.0*24.0*365.0
         
+        # Kippenhahn rasters, so re-rendering the same diagram skips the rebinning
+        self._kip_cache=_LRUCache(max_bytes=2**28,max_items=20)
+        # Profiles interpolated together by profile Kippenhahn plots
+        self._kip_block_size=256
+        # Size of the full resolution blocks of history Kippenhahn rasters pooled with lod=True
+        self._kip_block_bytes=2**26
+        
         self._kip_cbar_label = r'$\rm{sign}\left(\epsilon_{\rm{nuc}}-\epsilon_{\nu}\right)\log_{10}\left(\rm{max}\left(1.0,|\epsilon_{\rm{nuc}}-\epsilon_{\nu}|\right)\right)$'
         
         #..names of the stable isotopes
@@ -2021,7 +2030,8 @@ class plot(object):
                 y2=None,y2rng=None,mod_index=None,zlog=False,zone_frac=1.0,num_zones=None,
                 mix_hatch=False,hatch_color='black',hatch_func=None,
                 zaxis_norm=False,yaxis_norm=False,y2label=None,y2log=False,
-                zaxis_contour=False,zaxis_levels=None,y1log=False,dbg=False,cbar_ax=None,cpad=0.0,cbar_extend='neither'):
+                zaxis_contour=False,zaxis_levels=None,y1log=False,dbg=False,cbar_ax=None,cpad=0.0,cbar_extend='neither',
+                lod=False,workers=1):
                     
         if fig==None:
             fig=plt.figure(figsize=(12,12))
@@ -2118,17 +2128,46 @@ class plot(object):
             #May need to interpolate data:
             lin_x=np.linspace(data_x[modInd][0],data_x[modInd][-1],np.count_nonzero(data_x[modInd]))
             
-            #Get burn data
-            if show_burn:
-                data_z=self._getHistBurnData(m,data_x,data_y,modInd,burn_prefix,radius)
-                data_z=self._rebinKipDataX(data_z,data_x[modInd],lin_x)
-                if dbg:
-                    print(np.nanmin(data_z),np.nanmax(data_z))
+            # Rasters bigger than the axes are pooled down to its size in pixels, this bounds 
+            # the memory used but not the time, which still grows with the number of models
+            lod_size=None
+            if lod:
+                width,height=self._getAxesPixels(ax)
+                if width<np.size(lin_x) or height<np.size(data_y):
+                    lod_size=(int(np.minimum(width,np.size(lin_x))),int(np.minimum(height,np.size(data_y))))
+            
+            key=self._kipCacheKey(m,data_x[modInd],data_y,modInd,radius,show_burn,show_mix,mix,burn_prefix,mix_prefix,lod_size)
+            cached=None
+            if key is not None:
+                cached=self._kip_cache.get(key)
+            if lod_size is not None:
+                lin_x=np.linspace(lin_x[0],lin_x[-1],lod_size[0])
+                full_y=data_y
+                data_y=np.linspace(data_y[0],data_y[-1],lod_size[1])
+                
+            if cached is not None:
+                data_z,mix_data=cached
+            elif lod_size is not None:
+                data_z,mix_data=self._getHistKipLOD(m,data_x,full_y,modInd,lin_x,lod_size[1],
+                                                    show_burn,show_mix,mix,burn_prefix,mix_prefix,radius)
+                if key is not None:
+                    self._kip_cache.put(key,(data_z,mix_data),np.size(data_z)*8+np.size(mix_data)*8)
+            else:
+                #Get burn data
+                if show_burn:
+                    data_z=self._getHistBurnData(m,data_x,data_y,modInd,burn_prefix,radius)
+                    data_z=self._rebinKipDataX(data_z,data_x[modInd],lin_x)
+                
+                #Get mix data
+                if show_mix:
+                    mix_data=self._getHistMixData(m,data_x,data_y,modInd,mix,mix_prefix,radius)    
+                    mix_data=self._rebinKipDataX(mix_data,data_x[modInd],lin_x,nan=True,nan_value=1)
+                    
+                if key is not None:
+                    self._kip_cache.put(key,(data_z,mix_data),np.size(data_z)*8+np.size(mix_data)*8)
             
-            #Get mix data
-            if show_mix:
-                mix_data=self._getHistMixData(m,data_x,data_y,modInd,mix,mix_prefix,radius)    
-                mix_data=self._rebinKipDataX(mix_data,data_x[modInd],lin_x,nan=True,nan_value=1)
+            if dbg and show_burn:
+                print(np.nanmin(data_z),np.nanmax(data_z))
                                 
         else:
             show_mix=False
@@ -2136,43 +2175,67 @@ class plot(object):
             if mod_min is None:
                 mod_min=-1
                 mod_max=-1            
-            ip=m.iterateProfiles(rng=[mod_min,mod_max],silent=True)
-            count=0
+            # Two passes over the profiles, the first finds the shared y grid and the second 
+            # resamples onto it a block at a time, so only a block of raw profiles is held. Both 
+            # passes ask for the same columns, so the second is served by the profile cache
             zones=[]
-            for i in ip: 
+            y_min=[]
+            y_max=[]
+            cols=self._profileColumns([yaxis,zaxis],zaxis,hatch_func)
+            # With workers>1 the next profiles are parsed in the background while this one is used
+            prefetch=workers if workers>1 else 0
+            prof=m.prof
+            for i in m.iterateProfiles(rng=[mod_min,mod_max],silent=True,cols=cols,prefetch=prefetch):
                 data_x.append(m.prof.head[xaxis])
-                data_y.append(m.prof.data[yaxis])
+                y=self._getKipProfileY(m,yaxis,yaxis_norm)
+                y_min.append(np.nanmin(y))
+                y_max.append(np.nanmax(y))
+                zones.append(m.prof.head['num_zones'])
+            count=len(zones)
+            data_x=np.array(data_x)
+            
+            if num_zones is None:
+                num_zones=np.max(zones) * 1.0/zone_frac
+            data_y=np.linspace(np.nanmin(y_min),np.nanmax(y_max),int(num_zones))
+            
+            data_z=np.zeros((count,int(num_zones)))
+            if callable(hatch_func):
+                data_hatch=np.zeros((count,int(num_zones)))
+            block_y=[]
+            block_z=[]
+            block_hatch=[]
+            row=0
+            for i in m.iterateProfiles(rng=[mod_min,mod_max],silent=True,cols=cols,prefetch=prefetch):
+                block_y.append(self._getKipProfileY(m,yaxis,yaxis_norm))
                 
                 if callable(zaxis):
                     zz = zaxis(m)
                 else:
                     zz = m.prof.data[zaxis]
                     
-                if callable(hatch_func):
-                    data_hatch.append(hatch_func(m))
-                
-                data_z.append(zz)
-                
                 if zaxis_norm:
-                    data_z[-1] = data_z[-1]/np.max(data_z[-1])
+                    zz = zz/np.max(zz)
+                block_z.append(zz)
                     
-                if yaxis_norm:
-                    data_y[-1] = data_y[-1]/np.max(data_y[-1])
-                
-                zones.append(m.prof.head['num_zones'])
-                count=count+1
-                
-            data_x=np.array(data_x)
-            
-            
-            
-            if num_zones is None:
-                num_zones=np.max(zones) * 1.0/zone_frac
+                if callable(hatch_func):
+                    block_hatch.append(hatch_func(m))
                 
+                if len(block_y)==self._kip_block_size or row+len(block_y)==count:
+                    block=slice(row,row+len(block_y))
+                    data_z[block]=self._interpKipRows(block_y,block_z,data_y)
+                    if callable(hatch_func):
+                        data_hatch[block]=self._interpKipRows(block_y,block_hatch,data_y)
+                    row=row+len(block_y)
+                    block_y=[]
+                    block_z=[]
+                    block_hatch=[]
+            # Put back the caller's profile, rather than the last one loaded with only some columns
+            m.prof=prof
+            
+            lin_x=np.linspace(np.nanmin(data_x),np.nanmax(data_x),count)
             if callable(hatch_func):
-                data_hatch, _, _ = self._rebinKipDataXY(data_hatch, data_x, data_y, count, num_zones)            
-            
-            data_z, lin_x, data_y = self._rebinKipDataXY(data_z, data_x, data_y, count, num_zones)
+                data_hatch=self._rebinKipDataX(data_hatch,data_x,lin_x)
+            data_z=self._rebinKipDataX(data_z,data_x,lin_x)
 
 
         xmin=lin_x[0]
@@ -2207,6 +2270,8 @@ class plot(object):
                 newCm=cmap
             
         if zlog:
+            # Work on a copy, data_z may be a cached raster
+            data_z=np.array(data_z,dtype=float)
             #Get rid of warnigns about > nan's
             data_z[np.isnan(data_z)]=-1
             ind=(data_z>0)
@@ -2323,6 +2388,31 @@ class plot(object):
             plt.show()
             
             
+    def _kipCacheKey(self,m,data_x,data_y,modInd,*options):
+        """
+        Key for the history Kippenhahn raster of m, or None if it can not be cached.
+        data_x covers the choice of xaxis and age options and data_y the yaxis and 
+        num_zones/zone_frac, so they are hashed rather than listing every option.
+        The precision policy and loaded columns are included as the same file can be 
+        loaded with float32 columns or only some of its columns.
+        """
+        fingerprint=m.hist.__dict__.get('_fingerprint')
+        if fingerprint is None:
+            return None
+        h=hashlib.md5()
+        for i in [data_x,data_y,modInd]:
+            h.update(np.ascontiguousarray(i).tobytes())
+        options=tuple(np.atleast_1d(i).tolist() if np.size(i)>1 else i for i in options)
+        precision=m.precision
+        if precision is not None and not isinstance(precision,str):
+            precision=sorted(precision)
+        return (fingerprint,np.size(m.hist.model_number),h.hexdigest(),repr(options),
+                repr(precision),tuple(m.hist.data_names))
+            
+    def clearKipCache(self):
+        """Clears the cache of Kippenhahn rasters"""
+        self._kip_cache.clear()
+        
     def _setAgeLabel(self,ax,age_log,age_lookback,age_units):
         
         unit=''
@@ -2364,49 +2454,113 @@ class plot(object):
         return z
         
         
-    def _rebinKipqData(self,m,qtype,z,y,modInd,radius):
-        if np.all(modInd):
-            z=self._rebinKipqDataNoModInd(m,qtype,z,y,radius)
-        else:
-            # Much slower if we want to index over the x array (~factor 10), even if all modInd elements are True
-            z=self._rebinKipqDataWithModInd(m,qtype,z,y,modInd,radius)
-        return z
-    
-    def _rebinKipqDataNoModInd(self,m,qtype,z,y,radius):
-        if radius:
-            qtop=qtype+"top_"
-            add='add mix_relr_regions 40 and burn_relr_regions 40'
-        else:
-            qtop=qtype+"qtop_"
-            add='add mixing_regions 40 and burning_regions 40'
-        qtyp=qtype+"type_"
+    def _getAxesPixels(self,ax):
+        """Width and height of ax in pixels at the figure's dpi"""
+        bbox=ax.get_window_extent()
+        return int(np.ceil(bbox.width)),int(np.ceil(bbox.height))
         
-        try:
-            x = m.hist.data[qtop+"1"]
-        except ValueError:
-            raise KeyError("No field",qtop+"* found,",add,"to your history_columns.list")
+    def _getHistKipLOD(self,m,data_x,data_y,modInd,lin_x,num_y,show_burn,show_mix,mix,burn_prefix,mix_prefix,radius):
+        """
+        History Kippenhahn burn and mix rasters pooled down to len(lin_x) x num_y.
+        
+        Each column pools the models from the one _rebinKipDataX would pick for it up to the one 
+        picked for the next column, each row an equal share of the zones of data_y. Burning keeps 
+        the value with the largest magnitude and mixing the most common type, so regions thinner 
+        than a pixel still show. The models are processed in blocks of about self._kip_block_bytes
+        of full resolution raster.
+        
+        Only the memory used scales with the output size. Every selected model is still rasterised 
+        at full resolution before pooling, so the time taken scales with the number of models 
+        times the number of zones, as it does without pooling.
+        """
+        x=data_x[modInd]
+        rows=np.nonzero(modInd)[0]
+        sorter=np.argsort(x,kind='stable')
+        
+        reverse=lin_x[-1]<lin_x[0]
+        if reverse:
+            lin_x=lin_x[::-1]
+        
+        # Column j pools the sorted models from starts[j] up to the next column's start, columns 
+        # that share a start (when there are more columns than models) share the same models
+        starts=np.minimum(np.searchsorted(x,lin_x,sorter=sorter,side='left'),np.size(x)-1)
+        starts,columns=np.unique(starts,return_inverse=True)
+        ends=np.append(starts[1:],np.size(x))
+        edges_y=(np.arange(num_y)*np.size(data_y))//num_y
+        
+        data_z=np.zeros((np.size(starts),num_y))
+        mix_data=np.full((np.size(starts),num_y),np.nan)
+        block=np.maximum(self._kip_block_bytes//(8*np.size(data_y)),1)
+        
+        first=0
+        while first<np.size(starts):
+            last=np.searchsorted(starts,starts[first]+block,side='left')
+            last=np.minimum(np.maximum(last,first+1),np.size(starts))
+            lo=starts[first]
+            hi=ends[last-1]
+            edges_x=starts[first:last]-lo
+            
+            # The rasters come back in history order, put them in the sorted order of x
+            block_rows=rows[sorter[lo:hi]]
+            mask=np.zeros(np.size(modInd),dtype='bool')
+            mask[block_rows]=True
+            rank=np.argsort(np.argsort(block_rows))
+            
+            if show_burn:
+                z=self._getHistBurnData(m,data_x,data_y,mask,burn_prefix,radius)[rank]
+                data_z[first:last]=self._poolMaxAbs(z,edges_x,edges_y)
             
+            if show_mix:
+                z=self._getHistMixData(m,data_x,data_y,mask,mix,mix_prefix,radius)[rank]
+                z[z<1]=np.nan
+                mix_data[first:last]=self._poolMode(z,edges_x,edges_y)
+            first=last
+        
+        data_z=data_z[columns]
+        mix_data=mix_data[columns]
+        if reverse:
+            data_z=data_z[::-1]
+            mix_data=mix_data[::-1]
+        if not show_burn:
+            data_z=[]
+        if not show_mix:
+            mix_data=[]
+        return data_z,mix_data
+        
+    def _poolMaxAbs(self,z,edges_x,edges_y):
+        """
+        Pools z into the blocks starting at edges_x (axis 0) and edges_y (axis 1), keeping the 
+        value with the largest magnitude and ignoring nan's
+        """
+        high=np.fmax.reduceat(np.fmax.reduceat(z,edges_x,axis=0),edges_y,axis=1)
+        low=np.fmin.reduceat(np.fmin.reduceat(z,edges_x,axis=0),edges_y,axis=1)
+        return np.where(np.abs(low)>np.abs(high),low,high)
         
-        numBurnZones=int([xx.split('_')[-1] for xx in m.hist.data.dtype.names if qtop in xx][-1])
-
-        if radius:
-            if 'radius' in m.hist.data.dtype.names:
-                scaler = m.hist.data['radius']
-            else:
-                scaler = 10**m.hist.data['log_R']
-        else:
-            scaler = m.hist.data['star_mass']
-
-        for i in range(numBurnZones,0,-1):
-            mass=np.abs(m.hist.data[qtop+str(i)]*scaler)
-            ind=np.searchsorted(y,mass,side='left')
-            for j in range(np.size(ind)):
-                z[j,0:ind[j]]=m.hist.data[qtyp+str(i)][j]
-                
-        return z
+    def _poolMode(self,z,edges_x,edges_y):
+        """
+        Pools z, which holds positive integer types or nan, into the blocks starting at edges_x (axis 0) 
+        and edges_y (axis 1), keeping the most common type or nan if there are none
+        """
+        num_x=np.size(edges_x)
+        num_y=np.size(edges_y)
+        bin_x=np.repeat(np.arange(num_x),np.diff(np.append(edges_x,np.shape(z)[0])))
+        bin_y=np.repeat(np.arange(num_y),np.diff(np.append(edges_y,np.shape(z)[1])))
         
-    
-    def _rebinKipqDataWithModInd(self,m,qtype,z,y,modInd,radius):
+        ind=np.isfinite(z)
+        types=z[ind].astype('int')
+        num_types=np.max(types,initial=0)+1
+        bins=(bin_x[:,None]*num_y+bin_y)[ind]
+        counts=np.bincount(bins*num_types+types,minlength=num_x*num_y*num_types).reshape(num_x*num_y,num_types)
+        
+        result=np.argmax(counts,axis=1).astype('float')
+        result[np.max(counts,axis=1)==0]=np.nan
+        return result.reshape(num_x,num_y)
+        
+    def _rebinKipqData(self,m,qtype,z,y,modInd,radius):
+        """
+        Fills z (models x zones) with the region types of each model, the type of a
+        zone being that of the innermost region whose top is above it (0 if none are).
+        """
         if radius:
             qtop=qtype+"top_"
             add='add mix_relr_regions 40 and burn_relr_regions 40'
@@ -2420,8 +2574,10 @@ class plot(object):
         except ValueError:
             raise KeyError("No field",qtop+"* found,",add,"to your history_columns.list")
             
-        
         numBurnZones=int([xx.split('_')[-1] for xx in m.hist.data.dtype.names if qtop in xx][-1])
+        
+        if np.all(modInd):
+            modInd=slice(None)
 
         if radius:
             if 'radius' in m.hist.data.dtype.names:
@@ -2430,13 +2586,21 @@ class plot(object):
                 scaler = 10**m.hist.data['log_R'][modInd]
         else:
             scaler = m.hist.data['star_mass'][modInd]
-
-        for i in range(numBurnZones,0,-1):
-            mass=np.abs(m.hist.data[qtop+str(i)][modInd]*scaler)
-            ind=np.searchsorted(y,mass,side='left')
-            for j in range(np.size(ind)):
-                z[j,0:ind[j]]=m.hist.data[qtyp+str(i)][modInd][j]
-                
+        
+        # Gather the region tops and types as dense (models x regions) arrays
+        nmod=np.size(scaler)
+        tops=np.empty((nmod,numBurnZones))
+        types=np.zeros((nmod,numBurnZones+1))
+        for i in range(numBurnZones):
+            tops[:,i]=m.hist.data[qtop+str(i+1)][modInd]
+            types[:,i]=m.hist.data[qtyp+str(i+1)][modInd]
+        ind=np.searchsorted(y,np.abs(tops*scaler[:,None]).ravel(),side='left').reshape(nmod,numBurnZones)
+        
+        # Inner regions take precedence, so a region only covers the zones between 
+        # the furthest out any region inside it reaches and its own top
+        edge=np.maximum.accumulate(ind,axis=1)
+        lengths=np.diff(edge,axis=1,prepend=0,append=np.size(y))
+        z[:]=np.repeat(types.ravel(),lengths.ravel()).reshape(nmod,np.size(y))
         return z
         
         
@@ -2550,18 +2714,72 @@ class plot(object):
         data=np.array(data)
         return data
         
-    def _rebinKipDataXY(self,data_z,data_x,data_y,num_x_zones,num_y_zones):
-        ymin=np.nanmin([np.nanmin(y) for y in data_y])
-        ymax=np.nanmax([np.nanmax(y) for y in data_y])
-        data_y2=np.linspace(ymin,ymax,int(num_y_zones))
-        data_z2=np.zeros((np.size(data_x),int(num_y_zones)))
-        for i in range(len(data_x)):
-            f=interp1d(data_y[i], data_z[i],bounds_error=False,fill_value=np.nan)
-            data_z2[i,:]=f(data_y2)
-
-        lin_x=np.linspace(np.nanmin(data_x),np.nanmax(data_x),int(num_x_zones))
-        data_z=self._rebinKipDataX(data_z2,data_x,lin_x)
-        return data_z,lin_x,data_y2
+    def _profileColumns(self,names,*funcs):
+        """
+        The profile columns a plot needs, given the column names it uses directly and any
+        callables it is given. A callable can list the columns it reads as func.columns,
+        if any does not then [] is returned so every column is loaded.
+        """
+        cols=[i for i in names if isinstance(i,str)]
+        for f in funcs:
+            if not callable(f):
+                continue
+            if getattr(f,'columns',None) is None:
+                return []
+            cols=cols+list(f.columns)
+        return cols
+        
+    def _getKipProfileY(self,m,yaxis,yaxis_norm=False):
+        y=m.prof.data[yaxis]
+        if yaxis_norm:
+            y=y/np.max(y)
+        return y
+        
+    def _interpKipRows(self,data_y,data_z,lin_y):
+        """
+        Linearly interpolates each profile data_z[i](data_y[i]) onto the uniform grid lin_y,
+        all profiles at once. Grid points outside a profile are nan.
+        """
+        num_rows=len(data_y)
+        num_y=np.size(lin_y)
+        lengths=np.array([np.size(i) for i in data_y])
+        width=np.maximum(np.max(lengths),2)
+        
+        # Pad the profiles into one array, padding sorts to the end of each row
+        y=np.full((num_rows,width),np.inf)
+        z=np.full((num_rows,width),np.nan)
+        filled=np.arange(width)<lengths[:,None]
+        y[filled]=np.concatenate(data_y)
+        z[filled]=np.concatenate(data_z)
+        sorter=np.argsort(y,axis=1)
+        y=np.take_along_axis(y,sorter,axis=1)
+        z=np.take_along_axis(z,sorter,axis=1)
+        filled=np.isfinite(y)
+        lengths=np.count_nonzero(filled,axis=1)
+        
+        # The grid is uniform, so the first grid point at or above each sample is arithmetic,
+        # counting those per grid point gives each grid point's segment without a search
+        dy=(lin_y[-1]-lin_y[0])/np.maximum(num_y-1,1)
+        if dy==0:
+            dy=1.0
+        rows=np.nonzero(filled)[0]
+        cells=np.ceil((y[filled]-lin_y[0])/dy)
+        cells=np.clip(cells,0,num_y).astype('int')
+        counts=np.bincount(rows*(num_y+1)+cells,minlength=num_rows*(num_y+1))
+        below=np.cumsum(counts.reshape(num_rows,num_y+1)[:,:num_y],axis=1)
+        
+        left=np.clip(below-1,0,np.maximum(lengths-2,0)[:,None])
+        y0=np.take_along_axis(y,left,axis=1)
+        y1=np.take_along_axis(y,left+1,axis=1)
+        z0=np.take_along_axis(z,left,axis=1)
+        z1=np.take_along_axis(z,left+1,axis=1)
+        with np.errstate(invalid='ignore',divide='ignore'):
+            result=np.where(y1==y0,z1,z0+(lin_y-y0)*(z1-z0)/(y1-y0))
+        
+        last=np.take_along_axis(y,np.maximum(lengths-1,0)[:,None],axis=1)
+        outside=(lin_y<y[:,:1])|(lin_y>last)|(lengths<2)[:,None]
+        result[outside]=np.nan
+        return result
         
     def plotTRho(self,m,model=None,show=True,ax=None,xmin=None,xmax=None,fig=None,yrng=[None,None],
                 show_burn=False,show_mix=False,show_burn_labels=False,show_mix_labels=False,
@@ -2698,18 +2916,46 @@ class plot(object):
                         y1rev=False,
                         points=False,xlabel=None,y1label=None,
                         fig=None,
-                        show_mix=False,show_burn=True):
-        """Plots mulitple profiles either given as a list of mod numbers or an index over the history data"""
+                        show_mix=False,show_burn=True,workers=1,cols=None):
+        """
+        Plots mulitple profiles either given as a list of mod numbers or an index over the history data
+        
+        workers: If >1 the profiles are parsed in parallel by this many processes
+        cols: Columns to load from each profile, if None only those needed by the plot, [] loads all columns
+        
+        m.prof is left as it was.
+        """
         if fig==None:
             fig=plt.figure(figsize=(12,12))
         if ax==None:
             ax=fig.add_subplot(111)
         
+        if cols is None:
+            cols=[xaxis,y1]
+            if mods is not None and show_burn:
+                cols=cols+['net_nuclear_energy']
+            if mods is not None and show_mix:
+                cols=cols+['mixing_type','conv_mixing_type']
+            cols=self._profileColumns(cols)
+        
+        prof=m.prof
+        profiles=None
+        if workers>1:
+            if mods is not None:
+                profiles=m.loadProfiles(models=mods,workers=workers,cols=cols)
+            elif index is not None:
+                profiles=m.loadProfiles(models=m.hist.data["model_number"][index],workers=workers,cols=cols)
+        
         if mods is not None:
             cm=[cmap(i) for i in np.linspace(0.0,0.9,len(mods))]
             for i in range(len(mods)):
                 model=mods[i]
-                self.plotProfile(m,model=model,xaxis=xaxis,show=False,ax=ax,fig=fig,
+                if profiles is not None:
+                    m.prof=profiles[i]
+                else:
+                    m.loadProfile(num=int(model),cols=cols,silent=True)
+                # m.prof is already the nearest profile to model
+                self.plotProfile(m,xaxis=xaxis,show=False,ax=ax,fig=fig,
                                 xmin=xmin,xmax=xmax,xlog=xlog,xlabel=xlabel,
                             xrev=xrev,y1rev=y1rev,points=points,
                             y1=y1,y1log=y1log,y1col='k',
@@ -2717,13 +2963,18 @@ class plot(object):
                             show_mix_line=True,show_burn_line=True)
         elif index is not None:
             cm=[cmap(i) for i in np.linspace(0.0,0.9,np.count_nonzero(index))]
-            for i in m.hist.data["model_number"][index]:
-                model=m.hist.data["model_number"][index][i]
-                self.plotProfile(m,model=model,xaxis=xaxis,show=False,ax=ax,xmin=xmin,
+            for i,model in enumerate(m.hist.data["model_number"][index]):
+                if profiles is not None:
+                    m.prof=profiles[i]
+                else:
+                    m.loadProfile(num=int(model),cols=cols,silent=True)
+                self.plotProfile(m,xaxis=xaxis,show=False,ax=ax,xmin=xmin,
                                 xmax=xmax,xlog=xlog,xlabel=xlabel,
                             xrev=xrev,y1rev=y1rev,points=points,
                             y1=y1,y1log=y1log,y1col=cm[i],
                             y1label=y1label,fig=fig) 
+        # Put back the caller's profile, rather than the last one loaded with only some columns
+        m.prof=prof
         
         ax.legend(loc=0,fontsize=12)
         
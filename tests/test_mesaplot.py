@@ -6,9 +6,22 @@ except ImportError:
 	
 import mesaPlot as mp
 import os
+import shutil
+import gzip
+import tempfile
+import numpy as np
 import matplotlib.pyplot as plt
+import atexit
+import io
+import contextlib
 
-os.chdir('tests')
+# Run on a copy of the test data, so the caches written while loading stay out of the repository
+_TEST_DATA=tempfile.mkdtemp()
+for _folder in ['LOGS','work']:
+	shutil.copytree(os.path.join(os.path.dirname(os.path.abspath(__file__)),_folder),
+					os.path.join(_TEST_DATA,_folder),ignore=shutil.ignore_patterns('*.mpcache'))
+atexit.register(shutil.rmtree,_TEST_DATA,True)
+os.chdir(_TEST_DATA)
 
 class TestFileReader(unittest.TestCase):
 	def test_init(self):
@@ -42,6 +55,441 @@ class TestFileReader(unittest.TestCase):
 		m.log_fold='LOGS/'
 		m.loadProfile(f='LOGS/profile1.data')
 		
+	def test_load_fixed_width(self):
+		for fname in ['LOGS/history.data','LOGS/profile1.data']:
+			x=mp.data()
+			x._loadFile3(fname,cols=['star_age','logT'])
+			y=mp.data()
+			y._loadFile4(fname,cols=['star_age','logT'])
+			self.assertEqual(x.data.dtype,y.data.dtype)
+			self.assertEqual(x.head,y.head)
+			for i in x.data_names:
+				self.assertTrue(np.array_equal(x.data[i],y.data[i]))
+				
+	def test_load_cache(self):
+		fname='LOGS/profile2.data'
+		x=mp.data()
+		x.loadFile(fname,cols=['logT'],reload_pickle=True)
+		self.assertEqual(x.data_names,('zone','logT'))
+		y=mp.data()
+		y.loadFile(fname)
+		self.assertTrue(os.path.exists(fname+'.mpcache'))
+		z=mp.data()
+		z._loadFile4(fname)
+		self.assertEqual(y.data.dtype,z.data.dtype)
+		self.assertEqual(y.head,z.head)
+		for i in z.data_names:
+			self.assertTrue(np.array_equal(y.data[i],z.data[i]))
+			
+	def test_cache_check(self):
+		fname='LOGS/history.data'
+		for i in ['stat','sample','full']:
+			self.assertTrue(mp.file_reader._fingerprint(fname,i).startswith(i))
+			x=mp.data()
+			x.loadFile(fname,cache_check=i)
+			self.assertEqual(x._fingerprint,mp.file_reader._fingerprint(fname,i))
+		with self.assertRaises(ValueError):
+			mp.file_reader._fingerprint(fname,'md5')
+			
+	def test_lazy_cache(self):
+		folder=tempfile.mkdtemp()
+		fname=os.path.join(folder,'history.data')
+		shutil.copy('LOGS/history.data',fname)
+		try:
+			ref=mp.MESA()
+			ref.loadHistory(filename_in=fname,use_pickle=False)
+			mp.MESA().loadHistory(filename_in=fname)
+			m=mp.MESA()
+			m.loadHistory(filename_in=fname)
+			# Only the columns asked for are read from the cache
+			self.assertEqual(list(m.hist._lazy['columns']),['model_number'])
+			self.assertTrue(np.array_equal(m.hist.star_age,ref.hist.star_age))
+			self.assertEqual(sorted(m.hist._lazy['columns']),['model_number','star_age'])
+			self.assertEqual(m.hist.data_names,ref.hist.data_names)
+			self.assertTrue(np.array_equal(m.hist.data,ref.hist.data))
+			self.assertIsNone(m.hist._lazy)
+		finally:
+			shutil.rmtree(folder)
+			
+	def test_cache_checks(self):
+		calls=[]
+		fingerprint=mp.file_reader._fingerprint
+		def counted(*args):
+			calls.append(args[0])
+			return fingerprint(*args)
+		mp.file_reader._fingerprint=counted
+		try:
+			m=mp.MESA()
+			m.cache_check='full'
+			m.loadProfile(f='LOGS/profile2.data')
+			self.assertEqual(calls.count('LOGS/profile2.data'),1)
+		finally:
+			mp.file_reader._fingerprint=fingerprint
+			
+		folder=tempfile.mkdtemp()
+		fname=os.path.join(folder,'history.data')
+		try:
+			shutil.copy('LOGS/history.data',fname)
+			mp.MESA().loadHistory(filename_in=fname)
+			with open(fname,'ab') as f:
+				f.write(b'\n')
+			out=io.StringIO()
+			with contextlib.redirect_stdout(out):
+				mp.MESA().loadHistory(filename_in=fname,silent=True)
+			self.assertEqual(out.getvalue(),'')
+		finally:
+			shutil.rmtree(folder)
+			
+	def test_load_history_follow(self):
+		with open('LOGS/history.data','rb') as f:
+			lines=f.readlines()
+		folder=tempfile.mkdtemp()
+		fname=os.path.join(folder,'history.data')
+		try:
+			m=mp.MESA()
+			# Includes a backup to model 15 and a partially written line
+			for rows in [lines[:26],lines[26:36]+lines[20:30],lines[30:40]+[lines[40][:50]]]:
+				with open(fname,'ab') as f:
+					f.writelines(rows)
+				m.loadHistory(filename_in=fname,follow=True)
+			ref=mp.MESA()
+			ref.loadHistory(filename_in=fname,use_pickle=False)
+			self.assertTrue(np.array_equal(m.hist.data,ref.hist.data))
+			self.assertEqual(m.hist.model_number[-1],34)
+		finally:
+			shutil.rmtree(folder)
+			
+	def test_load_history_follow_partial(self):
+		with open('LOGS/history.data','rb') as f:
+			lines=f.readlines()
+		folder=tempfile.mkdtemp()
+		fname=os.path.join(folder,'history.data')
+		try:
+			with open(fname,'wb') as f:
+				f.writelines(lines[:36])
+			m=mp.MESA()
+			m.loadHistory(filename_in=fname,follow=True,max_num_lines=10)
+			self.assertEqual(list(m.hist.model_number),list(range(1,11)))
+			with open(fname,'ab') as f:
+				f.writelines(lines[36:41])
+			# Carries on after the last line read rather than the end of the file
+			m.loadHistory(filename_in=fname,follow=True,max_num_lines=10)
+			self.assertEqual(list(m.hist.model_number),list(range(1,36)))
+			# Different arguments start again
+			m.loadHistory(filename_in=fname,follow=True,final_lines=3)
+			self.assertEqual(list(m.hist.model_number),[33,34,35])
+		finally:
+			shutil.rmtree(folder)
+			
+	def test_profile_index(self):
+		m=mp.MESA()
+		m._loadProfileIndex('LOGS')
+		self.assertEqual(list(m._findProfiles([1,14,16,26,100,-1],'nearest')),[1,2,3,4,6,6])
+		self.assertEqual(list(m._findProfiles([14,16],'lower')),[2,2])
+		self.assertEqual(list(m._findProfiles([14,16],'upper')),[3,3])
+		self.assertEqual(list(m._selectProfiles(rng=[10,40],step=20)['model']),[10,30])
+		self.assertEqual(list(m._selectProfiles(priority=2)['profile']),[1])
+		ind=m.prof_ind
+		m._loadProfileIndex('LOGS')
+		self.assertTrue(m.prof_ind is ind)
+			
+	def test_iterate_history(self):
+		m=mp.MESA()
+		m.loadHistory(cols=['star_age'],max_model=40)
+		x=np.concatenate(list(m.iterateHistory(cols=['star_age'],max_model=40,chunk_size=7)))
+		self.assertTrue(np.array_equal(x,m.hist.data))
+		folder=tempfile.mkdtemp()
+		try:
+			filename=os.path.join(folder,'history.data.gz')
+			with open('LOGS/history.data','rb') as f, gzip.open(filename,'wb') as g:
+				g.write(f.read())
+			x=np.concatenate(list(m.iterateHistory(filename_in=filename,cols=['star_age'],max_model=40,chunk_size=7)))
+			self.assertTrue(np.array_equal(x,m.hist.data))
+		finally:
+			shutil.rmtree(folder)
+		
+	def test_load_profiles(self):
+		m=mp.MESA()
+		x=m.loadProfiles(models=[50,1,20],workers=2)
+		self.assertEqual([i.head['model_number'] for i in x],[50,1,20])
+		m.loadProfile(num=20)
+		self.assertTrue(m.prof is x[2])
+		
+	def test_iterate_profiles_prefetch(self):
+		m=mp.MESA()
+		models=[]
+		for i in m.iterateProfiles(rng=[10,40],prefetch=2,silent=True):
+			models.append(m.prof.head['model_number'])
+		self.assertEqual(models,[10,20,30,40])
+		
+	def test_profile_cache(self):
+		m=mp.MESA()
+		m.loadProfile(num=1,cols=['logT'])
+		self.assertEqual(m.prof.data_names,('zone','logT'))
+		m.loadProfile(num=1,cols=['logRho'])
+		self.assertEqual(m.prof.data_names,('zone','logRho'))
+		m.loadProfile(num=1,cols=['logRho'])
+		stats=m.profCacheStats()
+		self.assertEqual((stats['hits'],stats['misses'],stats['entries']),(1,2,2))
+		m.cache_size=stats['bytes']//2
+		self.assertEqual(m.profCacheStats()['entries'],1)
+		m.clearProfCache('LOGS/profile2.data')
+		self.assertEqual(m.profCacheStats()['entries'],1)
+		m.clearProfCache('LOGS')
+		self.assertEqual(m.profCacheStats()['entries'],0)
+		
+	def test_pack_profiles(self):
+		folder=tempfile.mkdtemp()
+		try:
+			shutil.copytree('LOGS',os.path.join(folder,'LOGS'))
+			m=mp.MESA()
+			m.log_fold=os.path.join(folder,'LOGS')
+			m.packProfiles()
+			for i in m.prof_ind['profile']:
+				os.remove(os.path.join(m.log_fold,'profile'+str(int(i))+'.data'))
+			os.remove(os.path.join(m.log_fold,'profiles.index'))
+			m.loadProfile(num=20,silent=True)
+			x=mp.data()
+			x.loadFile('LOGS/profile3.data')
+			self.assertEqual(m.prof.head,x.head)
+			self.assertTrue(np.array_equal(m.prof.data,x.data))
+			self.assertEqual(len(list(m.iterateProfiles(silent=True))),6)
+		finally:
+			shutil.rmtree(folder)
+
+	def test_repack_profiles(self):
+		folder=tempfile.mkdtemp()
+		try:
+			shutil.copytree('LOGS',os.path.join(folder,'LOGS'))
+			m=mp.MESA()
+			m.log_fold=os.path.join(folder,'LOGS')
+			m.packProfiles()
+			m.loadProfile(num=20,silent=True)
+			prof=m.prof
+			name=os.path.join(m.log_fold,'profile1.data')
+			with open(name) as f:
+				lines=f.readlines()
+			with open(name,'w') as f:
+				f.writelines(lines[:-200])
+			m.packProfiles()
+			self.assertFalse(os.path.exists(os.path.join(m.log_fold,'profiles.mparchive.tmp')))
+			self.assertRaises(IOError,getattr,prof,'logT')
+			m.loadProfile(num=20,silent=True)
+			x=mp.data()
+			x.loadFile('LOGS/profile3.data')
+			self.assertTrue(np.array_equal(m.prof.logT,x.logT))
+		finally:
+			shutil.rmtree(folder)
+
+	def test_data_views(self):
+		m=mp.MESA()
+		m.loadHistory()
+		h=m.hist
+		self.assertEqual(h[-1].model_number[0],h.data['model_number'][-1])
+		self.assertTrue(np.shares_memory(h[3].data,h.data))
+		self.assertRaises(IndexError,h.__getitem__,np.size(h.data))
+		v=h[h.model_number>10]
+		self.assertTrue(np.shares_memory(v.data,h.data))
+		self.assertTrue(np.all(v.model_number>10))
+		r=h.modelRange(5,8)
+		self.assertTrue(np.shares_memory(r.data,h.data))
+		self.assertTrue(np.array_equal(r.model_number,[5,6,7,8]))
+		self.assertEqual(r.head,h.head)
+
+	def test_data_attrs(self):
+		x=mp.data()
+		self.assertRaises(AttributeError,getattr,x,'model_number')
+		x.loadFile('LOGS/history.data')
+		self.assertEqual(sorted(dir(x)),sorted(set(x.head_names+x.data_names)))
+		self.assertTrue(np.array_equal(x.model_number,x.data['model_number']))
+		self.assertEqual(x.version_number,np.atleast_1d(x.head['version_number'])[0])
+		self.assertRaises(AttributeError,getattr,x,'not_a_column')
+		x.loadFile('LOGS/history.data',cols=['star_age'])
+		self.assertRaises(AttributeError,getattr,x,'log_L')
+
+	def test_final_lines(self):
+		x=mp.data()
+		x.loadFile('LOGS/history.data',use_pickle=False)
+		for n in [1,5,1000]:
+			y=mp.data()
+			y.loadFile('LOGS/history.data',final_lines=n)
+			self.assertTrue(np.array_equal(np.atleast_1d(y.data),x.data[-n:]))
+		folder=tempfile.mkdtemp()
+		try:
+			filename=os.path.join(folder,'history.data.gz')
+			with open('LOGS/history.data','rb') as f, gzip.open(filename,'wb') as g:
+				g.write(f.read())
+			y=mp.data()
+			y.loadFile(filename,final_lines=5)
+			self.assertTrue(np.array_equal(y.data['model_number'],x.data['model_number'][-5:]))
+		finally:
+			shutil.rmtree(folder)
+
+	def test_schema_only(self):
+		x=mp.data()
+		x.loadFile('LOGS/profile1.data',schema_only=True)
+		y=mp.data()
+		y.loadFile('LOGS/profile1.data',use_pickle=False)
+		self.assertEqual(np.size(x.data),0)
+		self.assertEqual(x.data.dtype,y.data.dtype)
+		self.assertEqual(x.head,y.head)
+
+	def test_columns_list(self):
+		m=mp.MESA()
+		x=mp.data()
+		x.loadFile('LOGS/history.data',schema_only=True)
+		isos=['h1','he3','he4','c12','n14','o16','ne20','mg24']
+		names,unresolved=m.loadColumnsList('work/history_columns.list',isos)
+		self.assertEqual(names,list(x.data_names))
+		self.assertEqual(unresolved,[])
+		names,unresolved=m.loadColumnsList('work/history_columns.list')
+		self.assertEqual(unresolved,['add_center_abundances'])
+		self.assertIn('mix_qtop_20',names)
+
+	def test_precision(self):
+		folder=tempfile.mkdtemp()
+		try:
+			filename=os.path.join(folder,'history.data')
+			shutil.copy('LOGS/history.data',filename)
+			full=mp.data()
+			full.loadFile(filename,use_pickle=False)
+			for i in range(2):
+				x=mp.data()
+				x.loadFile(filename,precision='reduced',silent=True)
+				self.assertEqual(x.data.dtype['star_age'],np.float64)
+				self.assertEqual(x.data.dtype['log_L'],np.float32)
+				self.assertEqual(x.data.dtype['mix_type_1'],np.int16)
+				self.assertTrue(np.array_equal(x.star_age,full.star_age))
+				self.assertTrue(np.allclose(x.log_L,full.log_L))
+			# The cache only holds float32 log_L, so this must reparse it
+			x=mp.data()
+			x.loadFile(filename,silent=True)
+			self.assertTrue(np.array_equal(x.data,full.data))
+			x=mp.data()
+			x.loadFile(filename,precision=['log_L'],silent=True)
+			self.assertEqual(x.data.dtype['log_L'],np.float64)
+			self.assertEqual(x.data.dtype['star_age'],np.float32)
+		finally:
+			shutil.rmtree(folder)
+
+	def test_grid(self):
+		folder=tempfile.mkdtemp()
+		try:
+			for i in ['run1','run2']:
+				os.makedirs(os.path.join(folder,i))
+				shutil.copy('LOGS/history.data',os.path.join(folder,i))
+			with open(os.path.join(folder,'run2','history.data'),'rb') as f:
+				lines=f.readlines()
+			with open(os.path.join(folder,'run2','history.data'),'wb') as f:
+				f.writelines(lines[:-10])
+			
+			m=mp.MESA()
+			m.loadHistory()
+			g=mp.MESAGrid(folder)
+			self.assertEqual(len(g.runs),2)
+			g.loadHistory(cols=['star_age'],workers=2)
+			self.assertEqual(g.hist.data_names,('run_id','model_number','star_age'))
+			self.assertEqual(list(g.offsets),[0,np.size(m.hist.data),2*np.size(m.hist.data)-10])
+			self.assertTrue(np.array_equal(g.run(1).star_age,m.hist.star_age[:-10]))
+			self.assertTrue(np.all(g.run(1).run_id==1))
+			self.assertEqual(g.run(0).version_number,m.hist.version_number)
+		finally:
+			shutil.rmtree(folder)
+
+	def test_grid_summary(self):
+		folder=tempfile.mkdtemp()
+		try:
+			for i in ['run1','run2']:
+				os.makedirs(os.path.join(folder,i,'LOGS'))
+				shutil.copy('LOGS/history.data',os.path.join(folder,i,'LOGS'))
+			with open('LOGS/history.data','rb') as f:
+				lines=f.readlines()
+			
+			reductions={'last_model':('model_number','last'),'max_Tc':('log_center_T','max'),
+						'version':('version_number','head')}
+			g=mp.MESAGrid(folder)
+			g.summarise(reductions)
+			self.assertEqual(list(g.summary['last_model']),[52,52])
+			with open(os.path.join(folder,'run2','LOGS','history.data'),'wb') as f:
+				f.writelines(lines[:-10])
+			g.summarise(reductions)
+			self.assertEqual(list(g.summary['last_model']),[52,42])
+			self.assertEqual(g.query(last_model=(50,None)),[os.path.join(folder,'run1','LOGS')])
+			self.assertEqual(len(g.query(version=11569)),2)
+			
+			g=mp.MESAGrid(folder)
+			g.summarise(reductions,update=False)
+			self.assertEqual(list(g.summary['last_model']),[52,42])
+			self.assertRaises(ValueError,g.summarise,{'a':('star_age','last')},update=False)
+		finally:
+			shutil.rmtree(folder)
+
+	def test_scrub_history(self):
+		folder=tempfile.mkdtemp()
+		try:
+			with open('LOGS/history.data','rb') as f:
+				lines=f.readlines()
+			os.makedirs(os.path.join(folder,'LOGS'))
+			# A retry of the last 5 models
+			with open(os.path.join(folder,'LOGS','history.data'),'wb') as f:
+				f.writelines(lines+lines[-10:])
+			m=mp.MESA()
+			m.scrubHistory(os.path.join(folder,'LOGS'),fileOut=os.path.join(folder,'scrubbed'))
+			with open(os.path.join(folder,'scrubbed'),'rb') as f:
+				self.assertEqual(f.readlines(),lines)
+			# Copied without loading (and so caching) the history
+			self.assertEqual(os.listdir(os.path.join(folder,'LOGS')),['history.data'])
+			
+			# Not fixed width, so the data has to be formatted
+			with open(os.path.join(folder,'LOGS','history.data'),'wb') as f:
+				f.writelines(lines[:6]+[b' '.join(i.split())+b'\n' for i in lines[6:]])
+			m.scrubHistory(os.path.join(folder,'LOGS'),fileOut=os.path.join(folder,'scrubbed'))
+			with open(os.path.join(folder,'scrubbed'),'rb') as f:
+				self.assertEqual(f.readlines(),lines[:3]+[b'\n']+lines[4:])
+				
+			m.scrubHistory(os.path.join(folder,'LOGS'),fileOut=os.path.join(folder,'scrubbed'),binary=True)
+			x=mp.MESA()
+			x.loadHistory(filename_in=os.path.join(folder,'scrubbed'))
+			self.assertTrue(np.array_equal(x.hist.data,m.hist.data))
+			self.assertEqual(x.hist.head,m.hist.head)
+		finally:
+			shutil.rmtree(folder)
+
+	def test_parallel_parse(self):
+		x=mp.data()
+		x.loadFile('LOGS/history.data',use_pickle=False)
+		y=mp.data()
+		y.loadFile('LOGS/history.data',use_pickle=False,workers=2,cols=['star_age'])
+		self.assertTrue(np.array_equal(y.star_age,x.star_age))
+		layout=mp.file_reader._readLayout('LOGS/history.data')
+		z,end=mp.file_reader._parseParallel('LOGS/history.data',layout,workers=3,min_rows=10)
+		self.assertTrue(np.array_equal(z,x.data))
+		self.assertEqual(end,os.path.getsize('LOGS/history.data'))
+
+	def test_load_mod(self):
+		lines=["! note: if file is gzip'd, can read it with zcat.","!",
+			"           1 -- model for mesa/star",""]
+		lines+=["   version_number   'r11701'","   M/Msun      2.0000000000000000D+00",
+			"   model_number      1",""]
+		lines+=["   lnd   lnT   dq"]
+		lines+=["    1  -1.5D+01   8.5D+00   2.5D-01","    2  -1.0D+01   9.0D+00   7.5D-01"]
+		lines+=[" ","   previous model"," ","   previous n_shells  2",
+			"   previous mass (grams)  1.0D+33","   timestep (seconds)  1.0D+07",
+			"   dt_next (seconds)  1.0D+07"," "]
+		folder=tempfile.mkdtemp()
+		try:
+			filename=os.path.join(folder,'test.mod')
+			with open(filename,'w') as f:
+				f.write('\n'.join(lines)+'\n')
+			m=mp.MESA()
+			m.loadMod(filename)
+			self.assertEqual(m.mod.head['star_mass'],2.0)
+			self.assertEqual(m.mod.data_names,('zone','lnd','lnT','dq','mass'))
+			self.assertTrue(np.array_equal(m.mod.data['lnT'],[8.5,9.0]))
+			self.assertTrue(np.allclose(m.mod.data['mass'],[2.0,1.5]))
+		finally:
+			shutil.rmtree(folder)
+		
 		
 class TestPlot(unittest.TestCase):
 	def setUp(self):
@@ -101,6 +549,133 @@ class TestPlot(unittest.TestCase):
 	def test_plotKip3(self):
 		self.p.plotKip3(self.m,show=False,age_lookback=True,xaxis='star_age')
 	
+	def test_plotKip3_range(self):
+		self.p.plotKip3(self.m,show=False,mod_min=10,mod_max=40,xstep=2)
+	
+	def test_rebin_kip_regions(self):
+		def loop(m,qtop,qtyp,z,y,modInd,scaler,num):
+			# The per model loop _rebinKipqData replaced
+			for i in range(num,0,-1):
+				mass=np.abs(m.hist.data[qtop+str(i)][modInd]*scaler[modInd])
+				ind=np.searchsorted(y,mass,side='left')
+				for j in range(np.size(ind)):
+					z[j,0:ind[j]]=m.hist.data[qtyp+str(i)][modInd][j]
+			return z
+		
+		rng=np.random.default_rng(42)
+		num=5
+		for nmod in [1,40]:
+			names=['star_mass','radius']+['burn_qtop_'+str(i) for i in range(1,num+1)]
+			names=names+['burn_top_'+str(i) for i in range(1,num+1)]+['burn_type_'+str(i) for i in range(1,num+1)]
+			x=np.zeros(nmod,dtype=[(i,'f8') for i in names])
+			x['star_mass']=rng.uniform(1,2,nmod)
+			x['radius']=rng.uniform(1,2,nmod)
+			for i in range(1,num+1):
+				# Mostly increasing region tops, with some descending edges and empty (0) regions
+				x['burn_qtop_'+str(i)]=np.clip(i/num+rng.normal(0,0.3,nmod),0,1)*(rng.uniform(size=nmod)>0.2)
+				x['burn_top_'+str(i)]=x['burn_qtop_'+str(i)]
+				x['burn_type_'+str(i)]=rng.integers(-3,10,nmod)
+			m=mp.MESA()
+			m.hist.data=x
+			y=np.linspace(0,2,300)
+			for modInd in [np.ones(nmod,dtype=bool),rng.uniform(size=nmod)>0.5]:
+				if not np.any(modInd):
+					continue
+				for radius,qtop,scaler in [(False,'burn_qtop_',x['star_mass']),(True,'burn_top_',x['radius'])]:
+					z=np.zeros((np.count_nonzero(modInd),np.size(y)))
+					expect=loop(m,qtop,'burn_type_',z.copy(),y,modInd,scaler,num)
+					z=self.p._rebinKipqData(m,'burn_',z,y,modInd,radius)
+					self.assertTrue(np.array_equal(z,expect))
+	
+	def test_plotKip3_cache(self):
+		self.p.clearKipCache()
+		self.p.plotKip3(self.m,show=False)
+		self.p.plotKip3(self.m,show=False,zlog=True,title='again')
+		self.assertEqual(self.p._kip_cache.stats()['hits'],1)
+		self.p.plotKip3(self.m,show=False,mod_max=40)
+		self.assertEqual(self.p._kip_cache.stats()['hits'],1)
+		# Reduced precision or a subset of the columns is a different raster
+		m=mp.MESA()
+		m.precision='reduced'
+		m.loadHistory()
+		self.p.plotKip3(m,show=False)
+		m=mp.MESA()
+		m.loadHistory(cols=['star_mass','star_age','num_zones']+[i for i in self.m.hist.data_names if i.startswith(('burn_','mix_'))])
+		self.p.plotKip3(m,show=False)
+		self.assertEqual(self.p._kip_cache.stats()['hits'],1)
+	
+	def test_plotKip3_profile(self):
+		self.p._kip_block_size=2
+		self.m.clearProfCache()
+		self.p.plotKip3(self.m,plot_type='profile',xaxis='model_number',zaxis='logT',
+						hatch_func=lambda m: m.prof.logRho,show=False)
+		# Each profile is parsed once, the second pass is served by the cache
+		self.assertEqual(self.m.profCacheStats()['misses'],6)
+		self.assertEqual(self.m.profCacheStats()['hits'],6)
+		ys=[]
+		zs=[]
+		for i in self.m.iterateProfiles(silent=True):
+			ys.append(self.m.prof.mass)
+			zs.append(self.m.prof.logT)
+		y=np.linspace(np.min(np.concatenate(ys)),np.max(np.concatenate(ys)),500)
+		z=self.p._interpKipRows(ys,zs,y)
+		for i in range(len(ys)):
+			expect=np.interp(y,ys[i][::-1],zs[i][::-1],left=np.nan,right=np.nan)
+			self.assertTrue(np.allclose(z[i],expect,equal_nan=True))
+	
+	def test_plot_profiles_workers(self):
+		self.m.clearProfCache()
+		self.p.plotMultiProfiles(self.m,mods=[10,20],xaxis='mass',y1='logT',show=False,workers=2)
+		# The profiles parsed by the pool are the ones plotted
+		self.assertEqual(self.m.profCacheStats()['hits'],0)
+		self.assertEqual(self.m.profCacheStats()['misses'],2)
+		
+		images=[]
+		for workers in [1,2]:
+			fig=plt.figure()
+			self.p.plotKip3(self.m,plot_type='profile',xaxis='model_number',zaxis='logT',
+							show=False,fig=fig,workers=workers)
+			images.append([i.get_array() for a in fig.axes for i in a.images])
+		self.assertTrue(np.array_equal(images[0][0],images[1][0],equal_nan=True))
+	
+	def test_plot_profile_cols(self):
+		names=[]
+		def logrho(m):
+			names.append(set(m.prof.data_names))
+			return m.prof.logRho
+		logrho.columns=['logRho']
+		prof=self.m.prof
+		self.p.plotKip3(self.m,plot_type='profile',xaxis='model_number',zaxis='logT',
+						hatch_func=logrho,show=False)
+		self.assertEqual(names[-1],set(['zone','mass','logT','logRho']))
+		self.assertIs(self.m.prof,prof)
+		self.m.clearProfCache()
+		self.p.plotMultiProfiles(self.m,mods=[10,20],xaxis='mass',y1='logT',show=False)
+		self.assertIs(self.m.prof,prof)
+		self.m.loadProfile(num=20,cols=['mass','logT','net_nuclear_energy'])
+		self.assertEqual(self.m.profCacheStats()['hits'],1)
+		self.assertEqual(self.p._profileColumns(['mass'],lambda m: m.prof.logT),[])
+	
+	def test_plotKip3_lod(self):
+		fig=plt.figure(figsize=(3,3),dpi=50)
+		self.p.plotKip3(self.m,show=False,fig=fig,lod=True)
+		ax=[i for i in fig.axes if len(i.images)][0]
+		width,height=self.p._getAxesPixels(ax)
+		for i in ax.images:
+			self.assertEqual(i.get_array().shape,(height,np.size(self.m.hist.data)))
+		
+		# A shell one zone thick survives pooling
+		z=np.zeros((4,10))
+		z[1,3]=-5.0
+		z[2,7]=2.0
+		self.assertEqual(self.p._poolMaxAbs(z,[0,2],[0,5]).tolist(),[[-5.0,0.0],[0.0,2.0]])
+		z=np.full((4,10),np.nan)
+		z[:,:2]=2
+		z[0,:4]=1
+		mix=self.p._poolMode(z,[0,2],[0,5])
+		self.assertEqual(mix[:,0].tolist(),[1.0,2.0])
+		self.assertTrue(np.all(np.isnan(mix[:,1])))
+	
 	def test_plotMix(self):
 		self.p.plotMix(self.m,show=False)	
 		